@@ -1,37 +1,119 @@
 import os
-import json
-from typing import Optional, Dict, List, Any
+import asyncio
+import functools
+from typing import Optional, Dict, List, Any, Final
 from pathlib import Path
 
+from utils import _json
+
+
+_SYSTEM_PROMPT: Final[str] = """You are JARVIS, an advanced AI assistant created to help with various tasks including:
+
+1. Coding and Programming - Write, debug, and explain code in multiple languages
+2. Data Analysis and Predictions - Analyze data patterns and make informed predictions
+3. General Assistance - Answer questions and help with various tasks
+4. File Processing - Analyze and extract information from uploaded files
+5. Research and Information - Provide accurate and helpful information
+
+You should be:
+- Professional yet friendly
+- Accurate and helpful
+- Clear in your explanations
+- Proactive in suggesting improvements
+- Honest about your limitations
+
+When working with code, always provide clean, well-commented, and efficient solutions.
+When making predictions, explain your reasoning and any assumptions.
+When uncertain, acknowledge it and suggest ways to get better information."""
+
+# Settings updates arriving within this many seconds are written to disk once
+SETTINGS_WRITE_DELAY = 0.5
+
+
+@functools.lru_cache(maxsize=8)
+def _load_json(path_str: str, mtime_ns: int, size: int) -> bytes:
+    """Read a JSON file's bytes; mtime and size are part of the cache key so edits invalidate it"""
+    with open(path_str, 'rb') as f:
+        return f.read()
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    """Load a JSON file, reading unchanged files from the cache"""
+    file_stat = path.stat()
+    # Parsed per call, so each caller gets its own dict to mutate
+    return _json.loads(_load_json(str(path), file_stat.st_mtime_ns, file_stat.st_size))
+
+
 class Config:
     """Configuration management for JARVIS AI Assistant"""
     
     def __init__(self):
-        # Server configuration
-        self.HOST = os.getenv("HOST", "127.0.0.1")
-        self.PORT = int(os.getenv("PORT", 8000))
-        self.DEBUG = os.getenv("DEBUG", "False").lower() == "true"
-        
-        # Ollama configuration
-        self.OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-        self.OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", 300))
-        
-        # API Keys for online models
-        self.CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY", "")
-        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-        self.DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
+        # Environment-backed settings are cached properties below, read on first access
+        self._env = os.environ
         
         # File paths
         self.CONFIG_DIR = Path("config")
         self.MODELS_CONFIG = self.CONFIG_DIR / "models.json"
         self.SETTINGS_CONFIG = self.CONFIG_DIR / "settings.json"
         
-        # Create config directory if it doesn't exist
-        self.CONFIG_DIR.mkdir(exist_ok=True)
-        
         # Load configurations
         self.models_config = self._load_models_config()
         self.settings_config = self._load_settings_config()
+        
+        # Pending debounced settings write, if any
+        self._settings_write_handle: Optional[asyncio.TimerHandle] = None
+        
+        # Index models by name for O(1) lookups in get_model_info
+        self._model_index = self._build_model_index()
+    
+    # Server configuration
+    @functools.cached_property
+    def HOST(self) -> str:
+        return self._env.get("HOST", "127.0.0.1")
+    
+    @functools.cached_property
+    def PORT(self) -> int:
+        return int(self._env.get("PORT", 8000))
+    
+    @functools.cached_property
+    def DEBUG(self) -> bool:
+        return self._env.get("DEBUG", "False").lower() == "true"
+    
+    # Ollama configuration
+    @functools.cached_property
+    def OLLAMA_HOST(self) -> str:
+        return self._env.get("OLLAMA_HOST", "http://localhost:11434")
+    
+    @functools.cached_property
+    def OLLAMA_TIMEOUT(self) -> int:
+        return int(self._env.get("OLLAMA_TIMEOUT", 300))
+    
+    # API Keys for online models
+    @functools.cached_property
+    def CLAUDE_API_KEY(self) -> str:
+        return self._env.get("CLAUDE_API_KEY", "")
+    
+    @functools.cached_property
+    def OPENAI_API_KEY(self) -> str:
+        return self._env.get("OPENAI_API_KEY", "")
+    
+    @functools.cached_property
+    def DEEPSEEK_API_KEY(self) -> str:
+        return self._env.get("DEEPSEEK_API_KEY", "")
+    
+    @functools.cached_property
+    def _api_keys(self) -> Dict[str, str]:
+        """API keys by provider name"""
+        return {
+            "claude": self.CLAUDE_API_KEY,
+            "openai": self.OPENAI_API_KEY,
+            "deepseek": self.DEEPSEEK_API_KEY
+        }
+    
+    @functools.cached_property
+    def _configured(self) -> Dict[str, bool]:
+        """Whether each provider has an API key set"""
+        return {provider: bool(key) for provider, key in self._api_keys.items()}
     
     def _load_models_config(self) -> Dict[str, Any]:
         """Load models configuration"""
@@ -139,15 +221,13 @@ class Config:
         
         if self.MODELS_CONFIG.exists():
             try:
-                with open(self.MODELS_CONFIG, 'r') as f:
-                    return json.load(f)
+                return _read_json(self.MODELS_CONFIG)
             except Exception as e:
                 print(f"Error loading models config: {e}")
                 return default_config
         else:
             # Create default config file
-            with open(self.MODELS_CONFIG, 'w') as f:
-                json.dump(default_config, f, indent=2)
+            self._write_config(self.MODELS_CONFIG, default_config)
             return default_config
     
     def _load_settings_config(self) -> Dict[str, Any]:
@@ -190,17 +270,21 @@ class Config:
         
         if self.SETTINGS_CONFIG.exists():
             try:
-                with open(self.SETTINGS_CONFIG, 'r') as f:
-                    return json.load(f)
+                return _read_json(self.SETTINGS_CONFIG)
             except Exception as e:
                 print(f"Error loading settings config: {e}")
                 return default_settings
         else:
             # Create default settings file
-            with open(self.SETTINGS_CONFIG, 'w') as f:
-                json.dump(default_settings, f, indent=2)
+            self._write_config(self.SETTINGS_CONFIG, default_settings)
             return default_settings
     
+    def _write_config(self, path: Path, data: Dict[str, Any]):
+        """Write a config file, creating the config directory only when needed"""
+        self.CONFIG_DIR.mkdir(exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_json.dumps(data, indent=True))
+    
     def get_recommended_models(self) -> List[Dict[str, Any]]:
         """Get list of recommended Ollama models"""
         return self.models_config.get("ollama_models", {}).get("recommended", [])
@@ -219,15 +303,15 @@ class Config:
     
     def get_claude_api_key(self) -> str:
         """Get Claude API key"""
-        return self.CLAUDE_API_KEY
+        return self._api_keys["claude"]
     
     def get_openai_api_key(self) -> str:
         """Get OpenAI API key"""
-        return self.OPENAI_API_KEY
+        return self._api_keys["openai"]
     
     def get_deepseek_api_key(self) -> str:
         """Get DeepSeek API key"""
-        return self.DEEPSEEK_API_KEY
+        return self._api_keys["deepseek"]
     
     def get_ui_settings(self) -> Dict[str, Any]:
         """Get UI settings"""
@@ -246,64 +330,66 @@ class Config:
             self.settings_config[category][key] = value
             
             # Save to file
-            with open(self.SETTINGS_CONFIG, 'w') as f:
-                json.dump(self.settings_config, f, indent=2)
+            self._schedule_settings_write()
             
             return True
         except Exception as e:
             print(f"Error updating setting: {e}")
             return False
     
+    def _schedule_settings_write(self):
+        """Debounce settings writes when running inside an event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_settings()
+            return
+        
+        if self._settings_write_handle is not None:
+            self._settings_write_handle.cancel()
+        self._settings_write_handle = loop.call_later(SETTINGS_WRITE_DELAY, self._write_settings)
+    
+    def _write_settings(self):
+        """Write settings to disk"""
+        self._settings_write_handle = None
+        try:
+            self._write_config(self.SETTINGS_CONFIG, self.settings_config)
+            _load_json.cache_clear()
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+    
+    def flush_settings(self):
+        """Write any pending debounced settings update immediately"""
+        if self._settings_write_handle is not None:
+            self._settings_write_handle.cancel()
+            self._write_settings()
+    
     def is_api_key_configured(self, provider: str) -> bool:
         """Check if API key is configured for a provider"""
-        if provider == "claude":
-            return bool(self.CLAUDE_API_KEY)
-        elif provider == "openai":
-            return bool(self.OPENAI_API_KEY)
-        elif provider == "deepseek":
-            return bool(self.DEEPSEEK_API_KEY)
-        return False
+        return self._configured.get(provider, False)
     
-    def get_model_info(self, model_name: str) -> Optional[Dict[str, Any]]:
-        """Get information about a specific model"""
-        # Check in recommended models
+    def _build_model_index(self) -> Dict[str, Dict[str, Any]]:
+        """Map model names to their entries, keeping the first match in lookup order"""
+        model_index = {}
         for model in self.get_recommended_models():
-            if model["name"] == model_name:
-                return model
+            model_index.setdefault(model["name"], model)
         
-        # Check in specialized models
         for model in self.get_specialized_models():
-            if model["name"] == model_name:
-                return model
+            model_index.setdefault(model["name"], model)
         
-        # Check in online models
         for provider_models in self.get_online_models().values():
             for model in provider_models:
-                if model["name"] == model_name:
-                    return model
+                model_index.setdefault(model["name"], model)
         
-        return None
+        return model_index
+    
+    def get_model_info(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """Get information about a specific model"""
+        return self._model_index.get(model_name)
     
     def get_system_prompt(self) -> str:
         """Get system prompt for the AI assistant"""
-        return """You are JARVIS, an advanced AI assistant created to help with various tasks including:
-
-1. Coding and Programming - Write, debug, and explain code in multiple languages
-2. Data Analysis and Predictions - Analyze data patterns and make informed predictions
-3. General Assistance - Answer questions and help with various tasks
-4. File Processing - Analyze and extract information from uploaded files
-5. Research and Information - Provide accurate and helpful information
-
-You should be:
-- Professional yet friendly
-- Accurate and helpful
-- Clear in your explanations
-- Proactive in suggesting improvements
-- Honest about your limitations
-
-When working with code, always provide clean, well-commented, and efficient solutions.
-When making predictions, explain your reasoning and any assumptions.
-When uncertain, acknowledge it and suggest ways to get better information."""
+        return _SYSTEM_PROMPT
 
 # Create global config instance
 config = Config()
\ No newline at end of file
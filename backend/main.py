@@ -1,36 +1,49 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 import asyncio
-import json
 import logging
+import logging.handlers
+import queue
 import os
-from typing import Optional, List, Dict, Any
+import sys
+import time
+from typing import Optional, List, Dict, Any, Set
 import httpx
 import aiofiles
 from datetime import datetime
 import uuid
 import subprocess
 import psutil
+from cachetools import TTLCache
 
-from config import Config
+from config import config
+from utils import _json
 from utils.model_manager import ModelManager
 from utils.file_processor import FileProcessor
+from utils.session_store import SessionStore
 
-# Configure logging
+# Configure logging: loggers only enqueue records, a background listener does the blocking writes.
+# The listener starts with the app, so processes that merely import this module (such as
+# spawned worker processes) neither open the log file nor start a thread
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.FileHandler('logs/jarvis.log', delay=True),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/jarvis.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="JARVIS AI Assistant", version="1.0.0")
+app = FastAPI(title="JARVIS AI Assistant", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -45,10 +58,12 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="frontend/dist"), name="static")
 
 # Initialize components
-config = Config()
 model_manager = ModelManager(config)
 file_processor = FileProcessor()
 
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Pydantic models
 class ChatMessage(BaseModel):
     message: str
@@ -67,29 +82,123 @@ class SystemStatus(BaseModel):
     available_models: List[str]
     system_resources: Dict[str, Any]
 
+# Session limits: idle sessions expire and each keeps only its most recent messages
+MAX_SESSIONS = 10_000
+SESSION_TTL_SECONDS = 3600
+MAX_SESSION_MESSAGES = 50
+
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.sessions: Dict[str, List[Dict]] = {}
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.active_connections: Set[WebSocket] = set()
+        self.sessions: TTLCache = TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS)
+        self.store = store
 
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
+        self.active_connections.add(websocket)
+        await self.get_history(session_id)
+
+    async def get_history(self, session_id: str) -> List[Dict]:
+        """A session's history, reloaded from the store if it expired from memory"""
+        history = self.sessions.get(session_id)
+        if history is None:
+            history = await self.store.load(session_id, MAX_SESSION_MESSAGES) if self.store else []
+            # A concurrent call may have loaded the session while we waited
+            history = self.sessions.setdefault(session_id, history)
+        return history
+
+    async def add_message(self, session_id: str, message: Dict) -> List[Dict]:
+        """Append a message to a session's history, dropping the oldest beyond the cap"""
+        history = await self.get_history(session_id)
+        history.append(message)
+        if len(history) > MAX_SESSION_MESSAGES:
+            del history[:-MAX_SESSION_MESSAGES]
+        # Re-inserting refreshes the session's TTL
+        self.sessions[session_id] = history
+        if self.store:
+            await self.store.append(session_id, message)
+        return history
+
+    async def clear_session(self, session_id: str):
+        """Forget a session's history, including any persisted copy"""
+        self.sessions.pop(session_id, None)
+        if self.store:
+            await self.store.delete(session_id)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        await asyncio.gather(*(connection.send_text(message) for connection in self.active_connections))
+
+session_persistence = config.settings_config.get("features", {}).get("session_persistence", False)
+manager = ConnectionManager(SessionStore(max_messages=MAX_SESSION_MESSAGES) if session_persistence is True else None)
+
+@app.on_event("shutdown")
+async def shutdown_sessions():
+    if manager.store:
+        await manager.store.close()
+    config.flush_settings()
+
+# Shared HTTP client for online providers: one connection pool for the app's lifetime
+@app.on_event("startup")
+async def startup_http_client():
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=config.OLLAMA_TIMEOUT,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    app.state.provider_headers = build_provider_headers()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await app.state.http.aclose()
+
+# System resource sampling: CPU is sampled in the background, disk usage is cached briefly
+CPU_SAMPLE_INTERVAL = 2
+DISK_USAGE_TTL = 10
+_disk_usage_cache: Dict[str, Any] = {"expires": 0.0, "value": None}
+
+async def sample_cpu_loop():
+    """Refresh app.state.cpu_percent periodically so requests never block on psutil"""
+    # The first non-blocking call only primes psutil's counters
+    psutil.cpu_percent(interval=None)
+    while True:
+        await asyncio.sleep(CPU_SAMPLE_INTERVAL)
+        app.state.cpu_percent = psutil.cpu_percent(interval=None)
+
+def get_disk_usage():
+    """Disk usage for '/', cached for DISK_USAGE_TTL seconds"""
+    now = time.monotonic()
+    if now >= _disk_usage_cache["expires"]:
+        _disk_usage_cache["value"] = psutil.disk_usage('/')
+        _disk_usage_cache["expires"] = now + DISK_USAGE_TTL
+    return _disk_usage_cache["value"]
 
-manager = ConnectionManager()
+@app.on_event("startup")
+async def startup_cpu_sampler():
+    app.state.cpu_percent = 0.0
+    app.state.cpu_sampler = asyncio.create_task(sample_cpu_loop())
+
+@app.on_event("shutdown")
+async def shutdown_cpu_sampler():
+    app.state.cpu_sampler.cancel()
+
+@app.on_event("shutdown")
+async def shutdown_file_processor():
+    file_processor.close()
+
+@app.on_event("startup")
+async def startup_log_listener():
+    log_listener.start()
+
+@app.on_event("shutdown")
+async def shutdown_log_listener():
+    log_listener.stop()
 
 # Health check endpoint
 @app.get("/health")
@@ -100,16 +209,18 @@ async def health_check():
         ollama_status = await model_manager.check_ollama_status()
         
         # Get system resources
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        cpu_percent = app.state.cpu_percent
+        memory, disk = await asyncio.gather(
+            asyncio.to_thread(psutil.virtual_memory),
+            asyncio.to_thread(get_disk_usage)
+        )
         
         system_resources = {
             "cpu_percent": cpu_percent,
             "memory_percent": memory.percent,
             "memory_available_gb": round(memory.available / (1024**3), 2),
             "disk_free_gb": round(disk.free / (1024**3), 2),
-            "disk_percent": round((disk.used / disk.total) * 100, 2)
+            "disk_percent": disk.percent
         }
         
         available_models = await model_manager.get_available_models()
@@ -121,24 +232,33 @@ async def health_check():
             system_resources=system_resources
         )
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_ts(ts: int) -> str:
+    """Format a time.time_ns() timestamp as an ISO 8601 string"""
+    return datetime.fromtimestamp(ts / 1e9).isoformat()
+
+def format_session_message(message: Dict) -> Dict:
+    """Session message as served to clients, with its timestamp formatted"""
+    return {
+        "role": message["role"],
+        "content": message["content"],
+        "timestamp": format_ts(message["ts"])
+    }
+
 # Chat endpoint
 @app.post("/chat")
 async def chat_endpoint(chat_request: ChatMessage):
     """Main chat endpoint"""
     try:
-        session_id = chat_request.session_id or str(uuid.uuid4())
+        session_id = chat_request.session_id or uuid.uuid4().hex
         
         # Store message in session
-        if session_id not in manager.sessions:
-            manager.sessions[session_id] = []
-        
-        manager.sessions[session_id].append({
+        history = await manager.add_message(session_id, {
             "role": "user",
             "content": chat_request.message,
-            "timestamp": datetime.now().isoformat()
+            "ts": time.time_ns()
         })
         
         # Process message
@@ -146,36 +266,46 @@ async def chat_endpoint(chat_request: ChatMessage):
             response = await process_online_model(
                 chat_request.message,
                 chat_request.online_provider,
-                manager.sessions[session_id]
+                history
             )
         else:
             response = await model_manager.generate_response(
                 chat_request.message,
                 chat_request.model,
-                manager.sessions[session_id]
+                history
             )
         
         # Store response in session
-        manager.sessions[session_id].append({
+        response_ts = time.time_ns()
+        await manager.add_message(session_id, {
             "role": "assistant",
             "content": response,
-            "timestamp": datetime.now().isoformat()
+            "ts": response_ts
         })
         
         return {
             "response": response,
             "session_id": session_id,
             "model_used": chat_request.online_provider if chat_request.use_online else chat_request.model,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": format_ts(response_ts)
         }
         
     except Exception as e:
-        logger.error(f"Chat error: {e}")
+        logger.error("Chat error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def save_upload(file: UploadFile, file_path: str) -> int:
+    """Stream an uploaded file to disk chunk by chunk and return its size in bytes"""
+    size = 0
+    async with aiofiles.open(file_path, 'wb') as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+            size += len(chunk)
+    return size
+
 # File upload endpoint
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(file: UploadFile = File(...), summary_stats: bool = False):
     """Handle file uploads"""
     try:
         # Create uploads directory if it doesn't exist
@@ -187,24 +317,22 @@ async def upload_file(file: UploadFile = File(...)):
         file_path = f"uploads/{unique_filename}"
         
         # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        file_size = await save_upload(file, file_path)
         
         # Process file
-        processed_content = await file_processor.process_file(file_path, file.content_type)
+        processed_content = await file_processor.process_file(file_path, file.content_type, summary_stats)
         
         return {
             "filename": file.filename,
             "file_id": unique_filename,
             "content_type": file.content_type,
             "processed_content": processed_content,
-            "file_size": len(content),
+            "file_size": file_size,
             "upload_time": datetime.now().isoformat()
         }
         
     except Exception as e:
-        logger.error(f"File upload error: {e}")
+        logger.error("File upload error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Model management endpoints
@@ -222,7 +350,7 @@ async def get_models():
         }
         
     except Exception as e:
-        logger.error(f"Get models error: {e}")
+        logger.error("Get models error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/models/switch")
@@ -241,7 +369,7 @@ async def switch_model(model_request: ModelSwitch):
         }
         
     except Exception as e:
-        logger.error(f"Model switch error: {e}")
+        logger.error("Model switch error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/models/pull/{model_name}")
@@ -258,7 +386,7 @@ async def pull_model(model_name: str):
         }
         
     except Exception as e:
-        logger.error(f"Model pull error: {e}")
+        logger.error("Model pull error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # WebSocket endpoint for real-time chat
@@ -268,7 +396,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = _json.loads(data)
             
             # Process message
             if message_data.get("use_online"):
@@ -285,11 +413,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 )
             
             # Send response
-            await manager.send_personal_message(json.dumps({
+            await manager.send_personal_message(_json.dumps({
                 "type": "response",
                 "content": response,
                 "timestamp": datetime.now().isoformat()
-            }), websocket)
+            }).decode(), websocket)
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -298,116 +426,135 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
 async def process_online_model(message: str, provider: str, conversation_history: List[Dict]):
     """Process message using online AI models"""
     try:
-        if provider == "claude":
-            return await call_claude_api(message, conversation_history)
-        elif provider == "openai":
-            return await call_openai_api(message, conversation_history)
-        elif provider == "deepseek":
-            return await call_deepseek_api(message, conversation_history)
-        else:
+        call_provider = PROVIDER_DISPATCH.get(provider)
+        if call_provider is None:
             raise ValueError(f"Unsupported online provider: {provider}")
+        return await call_provider(message, conversation_history, app.state.http)
     except Exception as e:
-        logger.error(f"Online model error: {e}")
+        logger.error("Online model error: %s", e)
         return f"Error processing with {provider}: {str(e)}"
 
-async def call_claude_api(message: str, history: List[Dict]):
+# System message sent ahead of every OpenAI conversation
+OPENAI_SYSTEM_MESSAGE = {"role": "system", "content": "You are JARVIS, an advanced AI assistant."}
+
+def build_provider_headers() -> Dict[str, Dict[str, str]]:
+    """Build the request headers for each online provider once"""
+    return {
+        "claude": {
+            "Content-Type": "application/json",
+            "x-api-key": config.get_claude_api_key(),
+            "anthropic-version": "2023-06-01"
+        },
+        "openai": {
+            "Authorization": f"Bearer {config.get_openai_api_key()}",
+            "Content-Type": "application/json"
+        },
+        "deepseek": {
+            "Authorization": f"Bearer {config.get_deepseek_api_key()}",
+            "Content-Type": "application/json"
+        }
+    }
+
+async def call_claude_api(message: str, history: List[Dict], client: httpx.AsyncClient):
     """Call Claude API"""
     # Note: You'll need to add your API key in config
-    api_key = config.get_claude_api_key()
-    if not api_key:
+    if not config.is_api_key_configured("claude"):
         return "Claude API key not configured"
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "Content-Type": "application/json",
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01"
-            },
-            json={
-                "model": "claude-3-sonnet-20240229",
-                "max_tokens": 2000,
-                "messages": [{"role": "user", "content": message}]
-            }
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["content"][0]["text"]
-        else:
-            return f"Claude API error: {response.status_code}"
+    response = await client.post(
+        "https://api.anthropic.com/v1/messages",
+        headers=app.state.provider_headers["claude"],
+        json={
+            "model": "claude-3-sonnet-20240229",
+            "max_tokens": 2000,
+            "messages": [{"role": "user", "content": message}]
+        }
+    )
+    
+    if response.status_code == 200:
+        result = response.json()
+        return result["content"][0]["text"]
+    else:
+        return f"Claude API error: {response.status_code}"
 
-async def call_openai_api(message: str, history: List[Dict]):
+async def call_openai_api(message: str, history: List[Dict], client: httpx.AsyncClient):
     """Call OpenAI API"""
-    api_key = config.get_openai_api_key()
-    if not api_key:
+    if not config.is_api_key_configured("openai"):
         return "OpenAI API key not configured"
     
-    async with httpx.AsyncClient() as client:
-        messages = [{"role": "system", "content": "You are JARVIS, an advanced AI assistant."}]
-        messages.extend([{"role": h["role"], "content": h["content"]} for h in history[-10:]])
-        messages.append({"role": "user", "content": message})
-        
-        response = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-4",
-                "messages": messages,
-                "max_tokens": 2000
-            }
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return f"OpenAI API error: {response.status_code}"
+    messages = [
+        OPENAI_SYSTEM_MESSAGE,
+        *({"role": h["role"], "content": h["content"]} for h in history[-10:]),
+        {"role": "user", "content": message}
+    ]
+    
+    response = await client.post(
+        "https://api.openai.com/v1/chat/completions",
+        headers=app.state.provider_headers["openai"],
+        json={
+            "model": "gpt-4",
+            "messages": messages,
+            "max_tokens": 2000
+        }
+    )
+    
+    if response.status_code == 200:
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
+    else:
+        return f"OpenAI API error: {response.status_code}"
 
-async def call_deepseek_api(message: str, history: List[Dict]):
+async def call_deepseek_api(message: str, history: List[Dict], client: httpx.AsyncClient):
     """Call DeepSeek API"""
-    api_key = config.get_deepseek_api_key()
-    if not api_key:
+    if not config.is_api_key_configured("deepseek"):
         return "DeepSeek API key not configured"
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "deepseek-chat",
-                "messages": [{"role": "user", "content": message}],
-                "max_tokens": 2000
-            }
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            return f"DeepSeek API error: {response.status_code}"
+    response = await client.post(
+        "https://api.deepseek.com/v1/chat/completions",
+        headers=app.state.provider_headers["deepseek"],
+        json={
+            "model": "deepseek-chat",
+            "messages": [{"role": "user", "content": message}],
+            "max_tokens": 2000
+        }
+    )
+    
+    if response.status_code == 200:
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
+    else:
+        return f"DeepSeek API error: {response.status_code}"
+
+# Online provider name -> API call
+PROVIDER_DISPATCH = {
+    "claude": call_claude_api,
+    "openai": call_openai_api,
+    "deepseek": call_deepseek_api
+}
 
 # Session management
 @app.get("/sessions/{session_id}")
 async def get_session_history(session_id: str):
     """Get conversation history for a session"""
-    return {
-        "session_id": session_id,
-        "messages": manager.sessions.get(session_id, [])
-    }
+    # Snapshot the list so messages added while streaming don't affect this response
+    messages = list(await manager.get_history(session_id))
+    return StreamingResponse(
+        stream_session_history(session_id, messages),
+        media_type="application/json"
+    )
+
+async def stream_session_history(session_id: str, messages: List[Dict]):
+    """Yield {"session_id": ..., "messages": [...]} one message at a time"""
+    yield b'{"session_id":' + _json.dumps(session_id) + b',"messages":['
+    for i, message in enumerate(messages):
+        chunk = _json.dumps(format_session_message(message))
+        yield b"," + chunk if i else chunk
+    yield b"]}"
 
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
     """Clear conversation history for a session"""
-    if session_id in manager.sessions:
-        del manager.sessions[session_id]
+    await manager.clear_session(session_id)
     return {"success": True, "message": "Session cleared"}
 
 # Voice endpoints
@@ -417,20 +564,18 @@ async def process_voice(file: UploadFile = File(...)):
     try:
         # Save uploaded audio file
         audio_path = f"uploads/audio_{uuid.uuid4()}.wav"
-        async with aiofiles.open(audio_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        await save_upload(file, audio_path)
         
         # Process audio to text (you can integrate Whisper or other STT)
         text = await speech_to_text(audio_path)
         
         # Clean up audio file
-        os.remove(audio_path)
+        await asyncio.to_thread(os.remove, audio_path)
         
         return {"text": text, "success": True}
         
     except Exception as e:
-        logger.error(f"Voice processing error: {e}")
+        logger.error("Voice processing error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 async def speech_to_text(audio_path: str) -> str:
@@ -443,11 +588,12 @@ if __name__ == "__main__":
     os.makedirs("logs", exist_ok=True)
     os.makedirs("uploads", exist_ok=True)
     
-    # Start server
+    # Start server on uvloop + httptools (uvloop is not available on Windows)
     uvicorn.run(
         app,
         host=config.HOST,
         port=config.PORT,
-        log_level="info",
-        reload=config.DEBUG
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Prompt assembly for Ollama; fully annotated plain Python so it can be compiled with mypyc"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Number of past messages included in a prompt
+HISTORY_WINDOW = 10
+
+# Prompt label per history role; other roles are left out of the prompt
+_ROLE_LABELS: Dict[str, str] = {"user": "User: ", "assistant": "Assistant: "}
+
+
+def render_system_prefix(system_prompt: str) -> str:
+    """Render the system header that starts every prompt"""
+    return f"System: {system_prompt}\n\n"
+
+
+def build_prompt(
+    system_prefix: str,
+    message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    turns: Iterable[Tuple[str, str]] = ()
+) -> str:
+    """Build a prompt from the system header, recent history (dicts or (role, content) turns) and the new message"""
+    # Build conversation context as parts joined once at the end
+    parts: List[str] = [system_prefix]
+    labels = _ROLE_LABELS
+
+    if conversation_history:
+        recent_history = conversation_history[-HISTORY_WINDOW:]
+        for msg in recent_history:
+            label = labels.get(msg.get("role", "user"))
+            if label is not None:
+                parts.append(f"{label}{msg.get('content', '')}\n")
+
+    for role, content in turns:
+        label = labels.get(role)
+        if label is not None:
+            parts.append(f"{label}{content}\n")
+
+    parts.append(f"User: {message}\nAssistant: ")
+
+    return "".join(parts)
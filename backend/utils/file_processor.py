@@ -1,27 +1,241 @@
 import os
-import json
+import sys
 import logging
 import mimetypes
-from typing import Dict, Any, Optional, List
+import mmap
+import multiprocessing
+import re
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple
 import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 import base64
+import datetime
+import heapq
+import io
+import zipfile
 
 # File processing libraries
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
 from PIL import Image
-import PyPDF2
-import docx
+import pypdfium2 as pdfium
 import openpyxl
+from python_calamine import CalamineWorkbook
 import csv
-import xml.etree.ElementTree as ET
+from collections import defaultdict
+from cachetools import LRUCache
+
+# Prefer libxml2 through lxml; fall back to the stdlib parser
+try:
+    from lxml import etree as ET
+    _LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _LXML = False
+
+# huge_tree lifts libxml2's depth/size limits; entities stay unexpanded
+_ITERPARSE_OPTIONS = {"huge_tree": True, "resolve_entities": False} if _LXML else {}
+
+from utils import _json
 
 logger = logging.getLogger(__name__)
 
+# Lookup table of ASCII whitespace bytes, for counting words
+_IS_SPACE = np.zeros(256, dtype=bool)
+_IS_SPACE[[9, 10, 11, 12, 13, 32]] = True
+
+@contextmanager
+def _map_file(file_path: str):
+    """Memory-map a file read-only; empty files cannot be mapped and yield b''"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def _count_lines_and_words(data, chunk_size: int = 1 << 24) -> Tuple[int, int]:
+    """Count newlines and whitespace-separated words in bytes or an mmap with NumPy"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = 0
+    words = 0
+    prev_is_space = True
+    
+    # Fixed-size chunks keep the temporary boolean arrays bounded
+    for start in range(0, len(buf), chunk_size):
+        chunk = buf[start:start + chunk_size]
+        newlines += int(np.count_nonzero(chunk == 0x0A))
+        is_space = _IS_SPACE[chunk]
+        # A word starts at each non-space byte preceded by a space
+        words += int(np.count_nonzero(is_space[:-1] & ~is_space[1:]))
+        words += int(prev_is_space and not is_space[0])
+        prev_is_space = bool(is_space[-1])
+    
+    return newlines, words
+
+def _decode_text(data) -> str:
+    """Decode UTF-8 bytes the way text-mode open() would, including newline translation"""
+    content = str(data, 'utf-8', 'ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+# WordprocessingML element tags
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = _W_NS + 'body'
+_W_P = _W_NS + 'p'
+_W_R = _W_NS + 'r'
+_W_T = _W_NS + 't'
+_W_TAB = _W_NS + 'tab'
+_W_BR = _W_NS + 'br'
+_W_CR = _W_NS + 'cr'
+_W_TBL = _W_NS + 'tbl'
+_W_TR = _W_NS + 'tr'
+_W_TC = _W_NS + 'tc'
+
+def _docx_paragraph_text(paragraph) -> str:
+    """Text of a w:p element: run text plus tabs and line breaks"""
+    parts = []
+    for run in paragraph.iter(_W_R):
+        for child in run:
+            if child.tag == _W_T:
+                parts.append(child.text or '')
+            elif child.tag == _W_TAB:
+                parts.append('\t')
+            elif child.tag in (_W_BR, _W_CR):
+                parts.append('\n')
+    return ''.join(parts)
+
+# Rows included in CSV previews
+CSV_PREVIEW_ROWS = 10
+XLSX_PREVIEW_ROWS = 5
+
+# Images at least this large never get a base64 preview
+IMAGE_PREVIEW_MAX_BYTES = 1024 * 1024
+
+# Line-anchored patterns for _extract_functions / _extract_imports, one C-level scan per file
+_PY_DEF_RE = re.compile(r'^[ \t]*(?:def[ \t]+([^(\n]*?)[ \t]*\(|class[ \t]+([^:\n]*?)[ \t]*:)', re.M)
+_JS_FUNCTION_RE = re.compile(
+    r'^(?:[^\n]*?\bfunction[ \t*]+([\w$]+)[ \t]*\('
+    r'|[ \t]*(?:export[ \t]+)?(?:const|let|var)[ \t]+([\w$]+)[ \t]*=[^\n]*=>)',
+    re.M
+)
+_JS_IMPORT_RE = re.compile(r'^[ \t]*(import [^\n]*|const [^\n]*require\([^\n]*)', re.M)
+_IMPORT_PATTERNS = {
+    '.py': re.compile(r'^[ \t]*((?:import|from) [^\n]*)', re.M),
+    '.js': _JS_IMPORT_RE,
+    '.ts': _JS_IMPORT_RE,
+}
+
+# Total size of the files whose process_file results are kept in memory, and the
+# largest file cached; results hold the decoded content, so they scale with the file
+PROCESS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+PROCESS_CACHE_MAX_FILE_BYTES = 4 * 1024 * 1024
+
+# Number of entries in analyze_directory's largest_files
+LARGEST_FILES_LIMIT = 10
+
+# Threads used to unlink old uploads
+CLEANUP_WORKERS = 16
+
+# Number of PDF pages handed to each worker process
+PDF_PAGES_PER_TASK = 16
+
+def _result_size(result: Dict[str, Any]) -> int:
+    """Weight of a cached process_file result: the size of its file"""
+    return max(result["file_info"].get("size_bytes", 0), 1)
+
+def _csv_dtype(values: List[str]) -> str:
+    """Name the pandas dtype read_csv would give a column holding these values"""
+    present = [value for value in values if value]
+    if not present:
+        return "float64"
+    try:
+        for value in present:
+            int(value)
+        # Missing values turn an integer column into floats
+        return "int64" if len(present) == len(values) else "float64"
+    except ValueError:
+        pass
+    try:
+        for value in present:
+            float(value)
+        return "float64"
+    except ValueError:
+        return "object"
+
+def _excel_dtype(values: List[Any]) -> str:
+    """Name the pandas dtype read_excel would give a column holding these calamine values"""
+    present = [value for value in values if value is not None]
+    if not present:
+        return "float64"
+    if all(isinstance(value, bool) for value in present):
+        return "bool" if len(present) == len(values) else "object"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        # Calamine returns whole numbers as floats; pandas reads them as integers unless values are missing
+        if len(present) == len(values) and all(float(value).is_integer() for value in present):
+            return "int64"
+        return "float64"
+    if all(isinstance(value, (datetime.date, datetime.datetime)) for value in present):
+        return "datetime64[ns]"
+    return "object"
+
+def _arrow_dtype(arrow_type: pa.DataType) -> str:
+    """Name the pandas dtype read_csv would give a column Arrow read as this type"""
+    # pandas leaves an all-empty column as floats and doesn't parse dates by default
+    if pa.types.is_null(arrow_type):
+        return "float64"
+    if pa.types.is_temporal(arrow_type):
+        return "object"
+    return str(np.dtype(arrow_type.to_pandas_dtype()))
+
+def _read_pdf_info(file_path: str) -> Tuple[int, Dict[str, str]]:
+    """Read the page count and document metadata of a PDF"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return len(pdf), pdf.get_metadata_dict()
+    finally:
+        pdf.close()
+
+def _extract_pdf_text_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) of a PDF; runs in a worker process"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        texts = []
+        for page_num in range(start, stop):
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+def _iter_files(root: str):
+    """Yield a DirEntry for every file under root, depth first, without following directory symlinks"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except OSError as e:
+            logger.warning(f"Error scanning directory {directory}: {e}")
+
 class FileProcessor:
     """Handles processing of various file types"""
     
-    def __init__(self):
+    def __init__(self, include_base64_preview: bool = False):
+        self.include_base64_preview = include_base64_preview
         self.supported_types = {
             # Text files
             'text/plain': self._process_text,
@@ -53,21 +267,70 @@ class FileProcessor:
             'text/html': self._process_code,
             'text/css': self._process_code,
         }
+        
+        # Extension -> content type for the supported types, so directory scans can skip mimetypes
+        mimetypes.init()
+        self._ext_to_ct = {
+            extension: content_type
+            for extension, content_type in mimetypes.types_map.items()
+            if content_type in self.supported_types
+        }
+        
+        # (abs path, mtime_ns, size, content type, summary stats flag) -> process_file result
+        self._results: LRUCache = LRUCache(maxsize=PROCESS_CACHE_MAX_BYTES, getsizeof=_result_size)
+        
+        # Worker processes for CPU-bound PDF text extraction, started on the first PDF
+        self._pdf_pool: Optional[ProcessPoolExecutor] = None
     
-    async def process_file(self, file_path: str, content_type: Optional[str] = None) -> Dict[str, Any]:
-        """Process file and extract content/metadata"""
+    def _get_pdf_pool(self) -> ProcessPoolExecutor:
+        """Create the PDF worker pool on first use"""
+        if self._pdf_pool is None:
+            # Never fork the threaded server process; a forkserver starts workers from a
+            # clean process that only has this module preloaded
+            if sys.platform == "win32":
+                context = multiprocessing.get_context("spawn")
+            else:
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            self._pdf_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+        return self._pdf_pool
+    
+    def close(self):
+        """Shut down worker processes"""
+        if self._pdf_pool is not None:
+            self._pdf_pool.shutdown()
+            self._pdf_pool = None
+    
+    async def process_file(
+        self,
+        file_path: str,
+        content_type: Optional[str] = None,
+        include_summary_stats: bool = False
+    ) -> Dict[str, Any]:
+        """Process file and extract content/metadata; include_summary_stats adds full CSV statistics"""
         try:
             # Determine content type if not provided
             if not content_type:
                 content_type, _ = mimetypes.guess_type(file_path)
             
-            # Get file info
-            file_info = self._get_file_info(file_path)
+            # Results are reused until the file's mtime or size changes
+            file_stat = os.stat(file_path)
+            cache_key = (os.path.abspath(file_path), file_stat.st_mtime_ns, file_stat.st_size, content_type, include_summary_stats)
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Get file info along with the first bytes of the file
+            file_info, head_bytes = self._get_file_info(file_path)
             
-            # Process based on content type
-            if content_type in self.supported_types:
+            # Process based on content type; only the CSV processor takes options
+            if content_type == 'text/csv':
+                content = await self._process_csv(file_path, include_summary_stats)
+            elif content_type in self.supported_types:
                 processor = self.supported_types[content_type]
                 content = await processor(file_path)
+            elif b'\0' in head_bytes:
+                content = {"error": f"Unsupported file type: {content_type}"}
             else:
                 # Try to process as text if unknown type
                 try:
@@ -75,13 +338,16 @@ class FileProcessor:
                 except:
                     content = {"error": f"Unsupported file type: {content_type}"}
             
-            return {
+            result = {
                 "file_info": file_info,
                 "content_type": content_type,
                 "processed_content": content,
                 "processing_time": file_info.get("processing_time"),
                 "success": "error" not in content
             }
+            if result["success"] and _result_size(result) <= PROCESS_CACHE_MAX_FILE_BYTES:
+                self._results[cache_key] = result
+            return result
             
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {e}")
@@ -91,10 +357,18 @@ class FileProcessor:
                 "success": False
             }
     
-    def _get_file_info(self, file_path: str) -> Dict[str, Any]:
-        """Get basic file information"""
+    async def _processed_content(self, file_path: str, content_type: Optional[str]) -> Dict[str, Any]:
+        """Processed content of a file, going through the process_file cache"""
+        result = await self.process_file(file_path, content_type)
+        return result.get("processed_content", result)
+    
+    def _get_file_info(self, file_path: str) -> Tuple[Dict[str, Any], bytes]:
+        """Get basic file information and the file's first 1 KB"""
         try:
-            file_stat = os.stat(file_path)
+            # One open serves both the stat and the binary sniff
+            with open(file_path, 'rb') as f:
+                file_stat = os.fstat(f.fileno())
+                head_bytes = f.read(1024)
             path_obj = Path(file_path)
             
             return {
@@ -104,35 +378,32 @@ class FileProcessor:
                 "size_mb": round(file_stat.st_size / (1024 * 1024), 2),
                 "created_time": file_stat.st_ctime,
                 "modified_time": file_stat.st_mtime,
-                "is_binary": self._is_binary_file(file_path)
-            }
+                "is_binary": b'\0' in head_bytes
+            }, head_bytes
         except Exception as e:
             logger.error(f"Error getting file info: {e}")
-            return {"error": str(e)}
-    
-    def _is_binary_file(self, file_path: str) -> bool:
-        """Check if file is binary"""
-        try:
-            with open(file_path, 'rb') as f:
-                chunk = f.read(1024)
-                return b'\0' in chunk
-        except:
-            return True
+            return {"error": str(e)}, b''
     
     async def _process_text(self, file_path: str) -> Dict[str, Any]:
         """Process plain text files"""
+        return await asyncio.to_thread(self._sync_process_text, file_path)
+    
+    def _sync_process_text(self, file_path: str) -> Dict[str, Any]:
+        """Process plain text files; runs in a worker thread"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            # Basic text analysis
-            lines = content.split('\n')
-            words = content.split()
+            # Count on the mapped bytes and decode straight from the mapping
+            with _map_file(file_path) as data:
+                newline_count, word_count = _count_lines_and_words(data)
+                content = _decode_text(data)
+                # Decoding turns \r\n and lone \r into \n, so count lines on the decoded text then
+                if data.find(b'\r') != -1:
+                    newline_count = content.count('\n')
+                line_count = newline_count + 1
             
             return {
                 "content": content,
-                "line_count": len(lines),
-                "word_count": len(words),
+                "line_count": line_count,
+                "word_count": word_count,
                 "character_count": len(content),
                 "preview": content[:500] + "..." if len(content) > 500 else content
             }
@@ -141,21 +412,34 @@ class FileProcessor:
             logger.error(f"Error processing text file: {e}")
             return {"error": str(e)}
     
-    async def _process_csv(self, file_path: str) -> Dict[str, Any]:
+    async def _process_csv(self, file_path: str, include_summary_stats: bool = False) -> Dict[str, Any]:
         """Process CSV files"""
+        return await asyncio.to_thread(self._sync_process_csv, file_path, include_summary_stats)
+    
+    def _sync_process_csv(self, file_path: str, include_summary_stats: bool = False) -> Dict[str, Any]:
+        """Process CSV files; runs in a worker thread"""
         try:
-            # Read CSV with pandas
-            df = pd.read_csv(file_path)
+            if not include_summary_stats:
+                return self._scan_csv(file_path)
+            
+            # Read CSV with Arrow's multithreaded reader
+            table = pv.read_csv(file_path, read_options=pv.ReadOptions(block_size=8 << 20))
+            
+            # Only numeric columns go through pandas, for describe()
+            numeric_columns = [
+                field.name for field in table.schema
+                if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+            ]
             
             # Basic analysis
             analysis = {
-                "row_count": len(df),
-                "column_count": len(df.columns),
-                "columns": df.columns.tolist(),
-                "data_types": df.dtypes.to_dict(),
-                "null_counts": df.isnull().sum().to_dict(),
-                "preview": df.head(10).to_dict('records'),
-                "summary_stats": df.describe().to_dict() if df.select_dtypes(include='number').empty == False else {}
+                "row_count": table.num_rows,
+                "column_count": table.num_columns,
+                "columns": table.column_names,
+                "data_types": {field.name: _arrow_dtype(field.type) for field in table.schema},
+                "null_counts": {name: table.column(name).null_count for name in table.column_names},
+                "preview": table.slice(0, CSV_PREVIEW_ROWS).to_pylist(),
+                "summary_stats": table.select(numeric_columns).to_pandas().describe().to_dict() if numeric_columns else {}
             }
             
             return analysis
@@ -164,16 +448,62 @@ class FileProcessor:
             logger.error(f"Error processing CSV file: {e}")
             return {"error": str(e)}
     
+    def _scan_csv(self, file_path: str) -> Dict[str, Any]:
+        """Stream a CSV once for counts and a preview, without loading it into memory"""
+        with open(file_path, 'r', newline='', encoding='utf-8', errors='ignore') as f:
+            reader = csv.reader(f)
+            columns = next(reader, [])
+            column_count = len(columns)
+            null_counts = [0] * column_count
+            preview = []
+            preview_rows = []
+            row_count = 0
+            
+            for row in reader:
+                # Blank lines are skipped, as Arrow and pandas do
+                if not row:
+                    continue
+                if row_count < CSV_PREVIEW_ROWS:
+                    preview.append(dict(zip(columns, row)))
+                    preview_rows.append(row)
+                
+                # Empty and missing trailing cells count as nulls
+                for i, value in enumerate(row[:column_count]):
+                    if not value:
+                        null_counts[i] += 1
+                for i in range(len(row), column_count):
+                    null_counts[i] += 1
+                
+                row_count += 1
+        
+        return {
+            "row_count": row_count,
+            "column_count": column_count,
+            "columns": columns,
+            # Inferred from the preview rows; full types come with include_summary_stats
+            "data_types": {
+                column: _csv_dtype([row[i] if i < len(row) else '' for row in preview_rows])
+                for i, column in enumerate(columns)
+            },
+            "null_counts": dict(zip(columns, null_counts)),
+            "preview": preview
+        }
+    
     async def _process_json(self, file_path: str) -> Dict[str, Any]:
         """Process JSON files"""
+        return await asyncio.to_thread(self._sync_process_json, file_path)
+    
+    def _sync_process_json(self, file_path: str) -> Dict[str, Any]:
+        """Process JSON files; runs in a worker thread"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            data = _json.loads(raw)
             
             return {
                 "content": data,
                 "type": type(data).__name__,
-                "size": len(str(data)),
+                "size": len(raw),
                 "keys": list(data.keys()) if isinstance(data, dict) else None,
                 "length": len(data) if isinstance(data, (list, dict)) else None
             }
@@ -184,35 +514,58 @@ class FileProcessor:
     
     async def _process_xml(self, file_path: str) -> Dict[str, Any]:
         """Process XML files"""
+        return await asyncio.to_thread(self._sync_process_xml, file_path)
+    
+    def _sync_process_xml(self, file_path: str) -> Dict[str, Any]:
+        """Process XML files; runs in a worker thread"""
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
+            # Stream the document, building each element's dict when it closes
+            stack = []
+            root_tag = None
+            content = None
             
-            def xml_to_dict(element):
+            for event, element in ET.iterparse(file_path, events=('start', 'end'), **_ITERPARSE_OPTIONS):
+                if event == 'start':
+                    if root_tag is None:
+                        root_tag = element.tag
+                    stack.append({})
+                    continue
+                
+                children = stack.pop()
                 result = {}
                 if element.text and element.text.strip():
                     result['text'] = element.text.strip()
+                result.update(children)
+                if element.attrib:
+                    result['@attributes'] = dict(element.attrib)
                 
-                for child in element:
-                    child_data = xml_to_dict(child)
-                    if child.tag in result:
-                        if not isinstance(result[child.tag], list):
-                            result[child.tag] = [result[child.tag]]
-                        result[child.tag].append(child_data)
-                    else:
-                        result[child.tag] = child_data
+                # Processed subtrees are no longer needed
+                tag = element.tag
+                element.clear()
+                if _LXML:
+                    # lxml keeps cleared siblings attached to the parent; drop them too. The root
+                    # has no parent, only top-level comments or processing instructions as siblings
+                    xml_parent = element.getparent()
+                    if xml_parent is not None:
+                        while element.getprevious() is not None:
+                            del xml_parent[0]
                 
-                if element.attrib:
-                    result['@attributes'] = element.attrib
+                if not stack:
+                    content = result
+                    continue
                 
-                return result
-            
-            content = xml_to_dict(root)
+                parent = stack[-1]
+                if tag in parent:
+                    if not isinstance(parent[tag], list):
+                        parent[tag] = [parent[tag]]
+                    parent[tag].append(result)
+                else:
+                    parent[tag] = result
             
             return {
-                "root_tag": root.tag,
+                "root_tag": root_tag,
                 "content": content,
-                "namespace": root.tag.split('}')[0][1:] if '}' in root.tag else None
+                "namespace": root_tag.split('}')[0][1:] if '}' in root_tag else None
             }
             
         except Exception as e:
@@ -222,58 +575,97 @@ class FileProcessor:
     async def _process_pdf(self, file_path: str) -> Dict[str, Any]:
         """Process PDF files"""
         try:
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                
-                text_content = ""
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text_content += page.extract_text() + "\n"
-                
-                metadata = pdf_reader.metadata
-                
-                return {
-                    "page_count": len(pdf_reader.pages),
-                    "text_content": text_content,
-                    "metadata": {
-                        "title": metadata.get('/Title', '') if metadata else '',
-                        "author": metadata.get('/Author', '') if metadata else '',
-                        "subject": metadata.get('/Subject', '') if metadata else '',
-                        "creator": metadata.get('/Creator', '') if metadata else ''
-                    },
-                    "word_count": len(text_content.split()),
-                    "preview": text_content[:1000] + "..." if len(text_content) > 1000 else text_content
-                }
-                
+            # PDFium is not thread-safe, so every call into it runs in the single-threaded worker processes
+            loop = asyncio.get_running_loop()
+            pdf_pool = self._get_pdf_pool()
+            page_count, metadata = await loop.run_in_executor(pdf_pool, _read_pdf_info, file_path)
+            
+            # Extract page ranges in parallel worker processes
+            page_texts = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pdf_pool,
+                    _extract_pdf_text_range,
+                    file_path,
+                    start,
+                    min(start + PDF_PAGES_PER_TASK, page_count)
+                )
+                for start in range(0, page_count, PDF_PAGES_PER_TASK)
+            ))
+            
+            text_content = "\n".join(page_text for texts in page_texts for page_text in texts)
+            
+            return {
+                "page_count": page_count,
+                "text_content": text_content,
+                "metadata": {
+                    "title": metadata.get('Title', ''),
+                    "author": metadata.get('Author', ''),
+                    "subject": metadata.get('Subject', ''),
+                    "creator": metadata.get('Creator', '')
+                },
+                "word_count": len(text_content.split()),
+                "preview": text_content[:1000] + "..." if len(text_content) > 1000 else text_content
+            }
+            
         except Exception as e:
             logger.error(f"Error processing PDF file: {e}")
             return {"error": str(e)}
     
     async def _process_docx(self, file_path: str) -> Dict[str, Any]:
         """Process DOCX files"""
+        return await asyncio.to_thread(self._sync_process_docx, file_path)
+    
+    def _sync_process_docx(self, file_path: str) -> Dict[str, Any]:
+        """Process DOCX files; runs in a worker thread"""
         try:
-            doc = docx.Document(file_path)
-            
-            # Extract text
-            full_text = []
-            for paragraph in doc.paragraphs:
-                full_text.append(paragraph.text)
+            # Stream word/document.xml, keeping body-level paragraphs and tables
+            paragraphs = []
+            tables_data = []
+            table_data = row_data = cell_paragraphs = None
+            open_tags = []
+            table_depth = 0
             
-            text_content = '\n'.join(full_text)
+            with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as document:
+                for event, element in ET.iterparse(document, events=('start', 'end'), **_ITERPARSE_OPTIONS):
+                    tag = element.tag
+                    if event == 'start':
+                        open_tags.append(tag)
+                        if tag == _W_TBL:
+                            table_depth += 1
+                            if table_depth == 1:
+                                table_data = []
+                        elif table_depth == 1 and tag == _W_TR:
+                            row_data = []
+                        elif table_depth == 1 and tag == _W_TC:
+                            cell_paragraphs = []
+                        continue
+                    
+                    open_tags.pop()
+                    parent = open_tags[-1] if open_tags else None
+                    
+                    if tag == _W_P:
+                        if parent == _W_BODY:
+                            paragraphs.append(_docx_paragraph_text(element))
+                            element.clear()
+                        elif parent == _W_TC and table_depth == 1:
+                            cell_paragraphs.append(_docx_paragraph_text(element))
+                    elif tag == _W_TC and table_depth == 1:
+                        row_data.append('\n'.join(cell_paragraphs))
+                    elif tag == _W_TR and table_depth == 1:
+                        table_data.append(row_data)
+                    elif tag == _W_TBL:
+                        table_depth -= 1
+                        if table_depth == 0:
+                            if parent == _W_BODY:
+                                tables_data.append(table_data)
+                            element.clear()
             
-            # Extract tables
-            tables_data = []
-            for table in doc.tables:
-                table_data = []
-                for row in table.rows:
-                    row_data = [cell.text for cell in row.cells]
-                    table_data.append(row_data)
-                tables_data.append(table_data)
+            text_content = '\n'.join(paragraphs)
             
             return {
                 "text_content": text_content,
-                "paragraph_count": len(doc.paragraphs),
-                "table_count": len(doc.tables),
+                "paragraph_count": len(paragraphs),
+                "table_count": len(tables_data),
                 "tables": tables_data,
                 "word_count": len(text_content.split()),
                 "preview": text_content[:1000] + "..." if len(text_content) > 1000 else text_content
@@ -299,24 +691,41 @@ class FileProcessor:
     
     async def _process_xlsx(self, file_path: str) -> Dict[str, Any]:
         """Process Excel XLSX files"""
+        return await asyncio.to_thread(self._sync_process_xlsx, file_path)
+    
+    def _sync_process_xlsx(self, file_path: str) -> Dict[str, Any]:
+        """Process Excel XLSX files; runs in a worker thread"""
         try:
-            # Read with pandas
-            excel_file = pd.ExcelFile(file_path)
+            # Calamine reads the sheet dimensions without materializing rows
+            workbook = CalamineWorkbook.from_path(file_path)
             sheets_data = {}
             
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+            for sheet_name in workbook.sheet_names:
+                sheet = workbook.get_sheet_by_name(sheet_name)
+                # Header row plus the preview rows
+                rows = sheet.to_python(nrows=XLSX_PREVIEW_ROWS + 1)
+                header = rows[0] if rows else []
+                columns = [str(name) if name != '' else f"Unnamed: {i}" for i, name in enumerate(header)]
+                preview = [
+                    {column: (value if value != '' else None) for column, value in zip(columns, row)}
+                    for row in rows[1:]
+                ]
+                
                 sheets_data[sheet_name] = {
-                    "row_count": len(df),
-                    "column_count": len(df.columns),
-                    "columns": df.columns.tolist(),
-                    "preview": df.head(5).to_dict('records'),
-                    "data_types": df.dtypes.to_dict()
+                    "row_count": max(sheet.height - 1, 0),
+                    "column_count": sheet.width,
+                    "columns": columns,
+                    "preview": preview,
+                    # Inferred from the preview rows, the only ones read
+                    "data_types": {
+                        column: _excel_dtype([row.get(column) for row in preview])
+                        for column in columns
+                    }
                 }
             
             return {
-                "sheet_names": excel_file.sheet_names,
-                "sheet_count": len(excel_file.sheet_names),
+                "sheet_names": workbook.sheet_names,
+                "sheet_count": len(workbook.sheet_names),
                 "sheets_data": sheets_data
             }
             
@@ -326,23 +735,29 @@ class FileProcessor:
     
     async def _process_xls(self, file_path: str) -> Dict[str, Any]:
         """Process Excel XLS files"""
+        return await asyncio.to_thread(self._sync_process_xls, file_path)
+    
+    def _sync_process_xls(self, file_path: str) -> Dict[str, Any]:
+        """Process Excel XLS files; runs in a worker thread"""
         try:
-            # Similar to XLSX but for older format
-            excel_file = pd.ExcelFile(file_path)
-            sheets_data = {}
-            
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                sheets_data[sheet_name] = {
-                    "row_count": len(df),
-                    "column_count": len(df.columns),
-                    "columns": df.columns.tolist(),
-                    "preview": df.head(5).to_dict('records')
-                }
+            # Similar to XLSX but for older format; sheets are parsed from the one open workbook
+            with pd.ExcelFile(file_path) as excel_file:
+                sheet_names = excel_file.sheet_names
+                sheets_data = {}
+                
+                for sheet_name in sheet_names:
+                    df = excel_file.parse(sheet_name)
+                    sheets_data[sheet_name] = {
+                        "row_count": len(df),
+                        "column_count": len(df.columns),
+                        "columns": df.columns.tolist(),
+                        "preview": df.head(XLSX_PREVIEW_ROWS).to_dict('records'),
+                        "data_types": {column: str(dtype) for column, dtype in zip(df.columns, df.dtypes)}
+                    }
             
             return {
-                "sheet_names": excel_file.sheet_names,
-                "sheet_count": len(excel_file.sheet_names),
+                "sheet_names": sheet_names,
+                "sheet_count": len(sheet_names),
                 "sheets_data": sheets_data
             }
             
@@ -352,21 +767,27 @@ class FileProcessor:
     
     async def _process_image(self, file_path: str) -> Dict[str, Any]:
         """Process image files"""
+        return await asyncio.to_thread(self._sync_process_image, file_path)
+    
+    def _sync_process_image(self, file_path: str) -> Dict[str, Any]:
+        """Process image files; runs in a worker thread"""
         try:
-            with Image.open(file_path) as img:
+            base64_data = None
+            source = file_path
+            
+            # Small images are read once and both decoded and encoded from the same bytes
+            if self.include_base64_preview and os.path.getsize(file_path) < IMAGE_PREVIEW_MAX_BYTES:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                base64_data = base64.b64encode(data).decode('ascii')
+                source = io.BytesIO(data)
+            
+            with Image.open(source) as img:
                 # Get image info
                 width, height = img.size
                 format_type = img.format
                 mode = img.mode
                 
-                # Convert to base64 for preview (if small enough)
-                file_size = os.path.getsize(file_path)
-                base64_data = None
-                
-                if file_size < 1024 * 1024:  # Less than 1MB
-                    with open(file_path, 'rb') as f:
-                        base64_data = base64.b64encode(f.read()).decode('utf-8')
-                
                 return {
                     "width": width,
                     "height": height,
@@ -383,9 +804,13 @@ class FileProcessor:
     
     async def _process_code(self, file_path: str) -> Dict[str, Any]:
         """Process code files"""
+        return await asyncio.to_thread(self._sync_process_code, file_path)
+    
+    def _sync_process_code(self, file_path: str) -> Dict[str, Any]:
+        """Process code files; runs in a worker thread"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            with _map_file(file_path) as data:
+                content = _decode_text(data)
             
             lines = content.split('\n')
             
@@ -442,63 +867,21 @@ class FileProcessor:
     
     def _extract_functions(self, content: str, extension: str) -> List[str]:
         """Extract function names from code"""
-        functions = []
-        lines = content.split('\n')
-        
-        try:
-            if extension == '.py':
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped.startswith('def ') and '(' in stripped:
-                        func_name = stripped[4:stripped.index('(')].strip()
-                        functions.append(func_name)
-                    elif stripped.startswith('class ') and ':' in stripped:
-                        class_name = stripped[6:stripped.index(':')].strip()
-                        functions.append(f"class {class_name}")
-            
-            elif extension in ['.js', '.ts']:
-                for line in lines:
-                    stripped = line.strip()
-                    if 'function ' in stripped and '(' in stripped:
-                        start = stripped.find('function ') + 9
-                        end = stripped.find('(', start)
-                        if end > start:
-                            func_name = stripped[start:end].strip()
-                            functions.append(func_name)
-                    elif '=>' in stripped and '=' in stripped:
-                        # Arrow functions
-                        parts = stripped.split('=')
-                        if len(parts) > 1:
-                            func_name = parts[0].strip().replace('const', '').replace('let', '').replace('var', '').strip()
-                            functions.append(func_name)
-            
-        except Exception:
-            pass
-        
-        return functions
+        if extension == '.py':
+            return [
+                match[1] if match[1] is not None else f"class {match[2]}"
+                for match in _PY_DEF_RE.finditer(content)
+            ]
+        if extension in ('.js', '.ts'):
+            return [name or arrow_name for name, arrow_name in _JS_FUNCTION_RE.findall(content)]
+        return []
     
     def _extract_imports(self, content: str, extension: str) -> List[str]:
         """Extract import statements from code"""
-        imports = []
-        lines = content.split('\n')
-        
-        try:
-            if extension == '.py':
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped.startswith('import ') or stripped.startswith('from '):
-                        imports.append(stripped)
-            
-            elif extension in ['.js', '.ts']:
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped.startswith('import ') or stripped.startswith('const ') and 'require(' in stripped:
-                        imports.append(stripped)
-            
-        except Exception:
-            pass
-        
-        return imports
+        pattern = _IMPORT_PATTERNS.get(extension)
+        if pattern is None:
+            return []
+        return [statement.strip() for statement in pattern.findall(content)]
     
     def get_supported_formats(self) -> Dict[str, List[str]]:
         """Get list of supported file formats"""
@@ -515,17 +898,28 @@ class FileProcessor:
         results = {}
         errors = []
         
-        for file_path in file_paths:
-            try:
-                result = await self.process_file(file_path)
-                results[file_path] = result
-            except Exception as e:
+        # Process files concurrently, with a cap on how many run at once
+        semaphore = asyncio.Semaphore(min(32, (os.cpu_count() or 1) * 4))
+        
+        async def process_one(file_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.process_file(file_path)
+        
+        outcomes = await asyncio.gather(
+            *(process_one(file_path) for file_path in file_paths),
+            return_exceptions=True
+        )
+        
+        for file_path, outcome in zip(file_paths, outcomes):
+            if isinstance(outcome, Exception):
                 error_info = {
                     "file_path": file_path,
-                    "error": str(e)
+                    "error": str(outcome)
                 }
                 errors.append(error_info)
-                logger.error(f"Batch processing error for {file_path}: {e}")
+                logger.error(f"Batch processing error for {file_path}: {outcome}")
+            else:
+                results[file_path] = outcome
         
         return {
             "processed_files": len(results),
@@ -544,54 +938,63 @@ class FileProcessor:
             file_analysis = {
                 "total_files": 0,
                 "total_size_mb": 0,
-                "file_types": {},
+                "file_types": defaultdict(int),
                 "largest_files": [],
                 "supported_files": [],
                 "unsupported_files": []
             }
             
-            all_files = []
-            for file_path in dir_path.rglob('*'):
-                if file_path.is_file():
-                    all_files.append(file_path)
+            # Min-heap of (size, -index, path, extension) holding the largest files seen so far;
+            # -index keeps the earlier file on size ties
+            largest = []
             
-            file_analysis["total_files"] = len(all_files)
-            
-            for file_path in all_files:
+            # Single pass over the tree; DirEntry caches the file type and stat result from the directory read
+            for index, entry in enumerate(_iter_files(directory_path)):
+                file_analysis["total_files"] += 1
+                file_path = entry.path
                 try:
-                    file_stat = file_path.stat()
+                    file_stat = entry.stat()
                     file_size_mb = file_stat.st_size / (1024 * 1024)
                     file_analysis["total_size_mb"] += file_size_mb
                     
                     # Track file types
-                    extension = file_path.suffix.lower()
-                    if extension in file_analysis["file_types"]:
-                        file_analysis["file_types"][extension] += 1
-                    else:
-                        file_analysis["file_types"][extension] = 1
+                    extension = os.path.splitext(entry.name)[1].lower()
+                    file_analysis["file_types"][extension] += 1
                     
                     # Track largest files
-                    file_info = {
-                        "path": str(file_path),
-                        "size_mb": round(file_size_mb, 2),
-                        "extension": extension
-                    }
-                    file_analysis["largest_files"].append(file_info)
+                    item = (file_stat.st_size, -index, file_path, extension)
+                    if len(largest) < LARGEST_FILES_LIMIT:
+                        heapq.heappush(largest, item)
+                    else:
+                        heapq.heappushpop(largest, item)
                     
-                    # Check if supported
-                    content_type, _ = mimetypes.guess_type(str(file_path))
+                    # Check if supported, resolving each new extension through mimetypes only once.
+                    # Encoding suffixes (a.csv.gz) take their type from the inner suffix, so those
+                    # are looked up per file
+                    if extension in self._ext_to_ct:
+                        content_type = self._ext_to_ct[extension]
+                    else:
+                        content_type, encoding = mimetypes.guess_type(file_path)
+                        if encoding is None:
+                            self._ext_to_ct[extension] = content_type
                     if content_type in self.supported_types or extension in ['.py', '.js', '.html', '.css']:
-                        file_analysis["supported_files"].append(str(file_path))
+                        file_analysis["supported_files"].append(file_path)
                     else:
-                        file_analysis["unsupported_files"].append(str(file_path))
+                        file_analysis["unsupported_files"].append(file_path)
                 
                 except Exception as e:
                     logger.warning(f"Error analyzing file {file_path}: {e}")
             
-            # Sort largest files
-            file_analysis["largest_files"].sort(key=lambda x: x["size_mb"], reverse=True)
-            file_analysis["largest_files"] = file_analysis["largest_files"][:10]  # Top 10
+            file_analysis["largest_files"] = [
+                {
+                    "path": file_path,
+                    "size_mb": round(size / (1024 * 1024), 2),
+                    "extension": extension
+                }
+                for size, _, file_path, extension in sorted(largest, reverse=True)
+            ]
             
+            file_analysis["file_types"] = dict(file_analysis["file_types"])
             file_analysis["total_size_mb"] = round(file_analysis["total_size_mb"], 2)
             
             return file_analysis
@@ -603,22 +1006,34 @@ class FileProcessor:
     def cleanup_temp_files(self, max_age_hours: int = 24):
         """Clean up temporary uploaded files"""
         try:
-            uploads_dir = Path("uploads")
-            if not uploads_dir.exists():
+            uploads_dir = "uploads"
+            if not os.path.isdir(uploads_dir):
                 return
             
             import time
-            current_time = time.time()
-            max_age_seconds = max_age_hours * 3600
+            cutoff = time.time() - max_age_hours * 3600
+            
+            # One scandir pass; each entry's stat() is a single call (free on Windows)
+            with os.scandir(uploads_dir) as entries:
+                old_files = [
+                    entry.path for entry in entries
+                    if entry.is_file() and entry.stat().st_mtime < cutoff
+                ]
+            
+            def remove(file_path: str) -> bool:
+                try:
+                    os.unlink(file_path)
+                    logger.info(f"Cleaned up old file: {file_path}")
+                    return True
+                except OSError as e:
+                    logger.warning(f"Error removing {file_path}: {e}")
+                    return False
             
+            # Unlink concurrently so per-call latency on network mounts overlaps
             cleaned_count = 0
-            for file_path in uploads_dir.iterdir():
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > max_age_seconds:
-                        file_path.unlink()
-                        cleaned_count += 1
-                        logger.info(f"Cleaned up old file: {file_path}")
+            if old_files:
+                with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as pool:
+                    cleaned_count = sum(pool.map(remove, old_files))
             
             logger.info(f"Cleaned up {cleaned_count} old files")
             
@@ -631,15 +1046,15 @@ class FileProcessor:
             content_type, _ = mimetypes.guess_type(file_path)
             
             if content_type == 'application/pdf':
-                result = await self._process_pdf(file_path)
+                result = await self._processed_content(file_path, content_type)
                 return result.get('text_content', '')
             
             elif content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-                result = await self._process_docx(file_path)
+                result = await self._processed_content(file_path, content_type)
                 return result.get('text_content', '')
             
             elif content_type == 'text/csv':
-                result = await self._process_csv(file_path)
+                result = await self._processed_content(file_path, content_type)
                 # Convert CSV data to readable text
                 if 'preview' in result:
                     preview_text = "CSV Data Preview:\n"
@@ -649,12 +1064,18 @@ class FileProcessor:
                 return str(result)
             
             elif content_type == 'application/json':
-                result = await self._process_json(file_path)
-                return json.dumps(result.get('content', {}), indent=2)
+                result = await self._processed_content(file_path, content_type)
+                return _json.dumps(result.get('content', {}), indent=True).decode('utf-8')
             
             elif content_type and content_type.startswith('text/'):
-                result = await self._process_text(file_path)
-                return result.get('content', '')
+                # Cached results of text and code files hold the text; other text/* processors
+                # (such as XML) return parsed content, so read those as plain text
+                result = await self._processed_content(file_path, content_type)
+                content = result.get('content')
+                if not isinstance(content, str):
+                    result = await self._process_text(file_path)
+                    content = result.get('content', '')
+                return content
             
             else:
                 # Try as text file
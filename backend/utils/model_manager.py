@@ -1,14 +1,79 @@
 import asyncio
+import hashlib
 import httpx
-import json
 import logging
+import os
 import subprocess
+import sys
 import psutil
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple, Deque
+from collections import deque
 import time
+from pathlib import Path
+from urllib.parse import quote
+from cachetools import TTLCache
+
+from utils import _json
+from utils._prompt import HISTORY_WINDOW, build_prompt, render_system_prefix
 
 logger = logging.getLogger(__name__)
 
+# Request bodies are serialized with orjson (via _json) and sent as raw content
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Fixed for the process lifetime
+_IS_WINDOWS = sys.platform.startswith("win")
+
+# How long (seconds) Ollama status and model list results are reused; a failed
+# status probe is only trusted briefly so a starting server is noticed quickly
+STATUS_CACHE_TTL = 5.0
+STATUS_FAILURE_CACHE_TTL = 0.5
+MODELS_CACHE_TTL = 5.0
+
+# /api/show results change only when a model is re-pulled, so they are kept for a day
+MODEL_INFO_CACHE_TTL = 24 * 3600
+# Concurrent /api/show requests made by get_models_info
+MODEL_INFO_CONCURRENCY = 5
+
+# Concurrent /api/generate requests made by generate_responses
+GENERATE_MAX_PARALLEL = 8
+
+# Minimum seconds between repeated progress logs for the same pull status
+PULL_LOG_INTERVAL = 0.5
+
+# GPU readings are reused for this long, so rapid polling launches nvidia-smi at most once a second
+GPU_INFO_CACHE_TTL = 1.0
+
+# Seconds to wait for a freshly spawned `ollama serve` to answer
+OLLAMA_START_TIMEOUT = 15.0
+
+# Model list and model info survive restarts under this directory for a day, in a
+# subdirectory per Ollama host; stale entries are still served when Ollama can't be reached
+CACHE_DIR = Path.home() / ".jarves" / "cache"
+DISK_CACHE_TTL = 24 * 3600
+
+def _cpu_busy_and_total(times) -> Tuple[float, float]:
+    """Busy and total CPU seconds from psutil.cpu_times(), counted the way psutil.cpu_percent does"""
+    total = sum(times)
+    # Guest time is already included in user/nice on Linux
+    total -= getattr(times, "guest", 0) + getattr(times, "guest_nice", 0)
+    busy = total - times.idle - getattr(times, "iowait", 0)
+    return busy, total
+
+async def _aiter_ndjson_lines(response: httpx.Response):
+    """Yield the non-empty lines of a streamed NDJSON response as bytes, without decoding to str"""
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes():
+        buffer.extend(chunk)
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            if end > start:
+                yield bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
 class ModelManager:
     """Manages Ollama models and API interactions"""
     
@@ -17,28 +82,121 @@ class ModelManager:
         self.ollama_host = config.OLLAMA_HOST
         self.timeout = config.OLLAMA_TIMEOUT
         self.current_model = config.get_behavior_settings().get("default_model", "llama3.2")
+        self.refresh_system_prompt()
+        self.refresh_behavior()
+        
+        # Recent (role, content) turns, only used by calls that opt in with use_builtin_history;
+        # the instance is shared by every session, so the server passes each session's history instead
+        self._history: Deque[Tuple[str, str]] = deque(maxlen=HISTORY_WINDOW)
         self._client = None
+        self._client_lock = asyncio.Lock()
+        self._start_task: Optional[asyncio.Task] = None
+        self._limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0)
+        
+        # (expires_at, status) and (timestamp, models) caches; the locks make concurrent
+        # callers share one request
+        self._status_cache: Tuple[float, Optional[bool]] = (0.0, None)
+        self._status_lock = asyncio.Lock()
+        # The flag records whether the list came from Ollama rather than the disk cache
+        self._models_cache: Tuple[float, Optional[List[str]], bool] = (0.0, None, False)
+        self._models_lock = asyncio.Lock()
+        self._model_info_cache: TTLCache = TTLCache(maxsize=256, ttl=MODEL_INFO_CACHE_TTL)
+        
+        # Fixed for the process lifetime
+        self._cpu_count = psutil.cpu_count()
+        # CPU times at the previous reading; kept here rather than relying on cpu_percent's
+        # per-thread baseline, which other callers on the loop thread would reset
+        self._cpu_times = _cpu_busy_and_total(psutil.cpu_times())
+        
+        # None until nvidia-smi has been tried; (expires_at, gpu info) for the last query
+        self._nvidia_smi_available: Optional[bool] = None
+        self._gpu_cache: Tuple[float, Optional[Dict[str, Any]]] = (0.0, None)
+        
+        self._cache_dir = CACHE_DIR / hashlib.sha1(self.ollama_host.encode()).hexdigest()[:16]
+        # Serve model list/info from the disk cache only, never asking Ollama
+        self._remote_disabled = bool(os.environ.get("JARVES_DISABLE_REMOTE_MODELS"))
+    
+    def refresh_system_prompt(self):
+        """Re-render the cached system prompt header, e.g. after a config reload"""
+        self._system_prefix = render_system_prefix(self.config.get_system_prompt())
+    
+    def refresh_behavior(self):
+        """Rebuild the cached generation options from the behavior settings, e.g. after a config reload"""
+        behavior = self.config.get_behavior_settings()
+        self._gen_options = {
+            "temperature": behavior.get("temperature", 0.7),
+            "top_p": 0.9,
+            "top_k": 40,
+            "num_predict": behavior.get("max_tokens", 2000)
+        }
     
     async def get_client(self):
         """Get HTTP client with proper configuration"""
         if self._client is None:
-            self._client = httpx.AsyncClient(timeout=self.timeout)
+            async with self._client_lock:
+                # A concurrent caller may have created it while we waited
+                if self._client is None:
+                    # Pool settings live on the transport, since a custom transport replaces the client's own
+                    self._client = httpx.AsyncClient(
+                        base_url=self.ollama_host,
+                        timeout=self.timeout,
+                        transport=httpx.AsyncHTTPTransport(limits=self._limits, http2=True, retries=1)
+                    )
         return self._client
     
     async def check_ollama_status(self) -> bool:
         """Check if Ollama is running and accessible"""
+        expires_at, status = self._status_cache
+        if status is not None and time.monotonic() < expires_at:
+            return status
+        
+        async with self._status_lock:
+            # Another caller may have refreshed the status while we waited
+            expires_at, status = self._status_cache
+            if status is not None and time.monotonic() < expires_at:
+                return status
+            
+            status = await self._probe_ollama()
+            ttl = STATUS_CACHE_TTL if status else STATUS_FAILURE_CACHE_TTL
+            self._status_cache = (time.monotonic() + ttl, status)
+            return status
+    
+    def invalidate_status(self):
+        """Forget the cached Ollama status so the next check probes the server"""
+        self._status_cache = (0.0, None)
+    
+    async def _probe_ollama(self) -> bool:
+        """Query the Ollama version endpoint"""
         try:
             client = await self.get_client()
-            response = await client.get(f"{self.ollama_host}/api/version")
+            response = await client.get("/api/version")
             return response.status_code == 200
         except Exception as e:
-            logger.warning(f"Ollama not accessible: {e}")
+            logger.warning("Ollama not accessible: %s", e)
             return False
     
     async def start_ollama(self) -> bool:
         """Start Ollama service if not running"""
+        # Check if already running
+        if await self.check_ollama_status():
+            return True
+        
+        # Concurrent callers share one startup attempt instead of each spawning a server
+        start_task = self._start_task
+        if start_task is None:
+            start_task = self._start_task = asyncio.create_task(self._launch_ollama())
+            start_task.add_done_callback(self._clear_start_task)
+        return await asyncio.shield(start_task)
+    
+    def _clear_start_task(self, task: asyncio.Task):
+        """Forget a finished startup attempt so a later failure can try again"""
+        if self._start_task is task:
+            self._start_task = None
+    
+    async def _launch_ollama(self) -> bool:
+        """Spawn `ollama serve` and wait for it to answer"""
         try:
-            # Check if already running
+            # Another startup may have finished between the caller's check and now
             if await self.check_ollama_status():
                 return True
             
@@ -49,48 +207,144 @@ class ModelManager:
                     creationflags=subprocess.CREATE_NEW_CONSOLE
                 )
             else:
+                # Nobody reads the server's output; undrained pipes would eventually block it
                 process = subprocess.Popen(
                     ["ollama", "serve"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
                 )
             
-            # Wait a bit for startup
-            await asyncio.sleep(5)
-            
-            # Check if it started successfully
-            return await self.check_ollama_status()
+            # Poll until the server answers, backing off up to once a second
+            deadline = time.monotonic() + OLLAMA_START_TIMEOUT
+            delay = 0.1
+            while time.monotonic() < deadline:
+                # Drop the cached "not running" status so each check probes again
+                self.invalidate_status()
+                if await self.check_ollama_status():
+                    return True
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.5, 1.0)
+            
+            logger.error("Ollama did not become ready within %.0fs", OLLAMA_START_TIMEOUT)
+            return False
             
         except Exception as e:
-            logger.error(f"Failed to start Ollama: {e}")
+            logger.error("Failed to start Ollama: %s", e)
             return False
     
     def _is_windows(self) -> bool:
         """Check if running on Windows"""
-        import platform
-        return platform.system().lower() == "windows"
+        return _IS_WINDOWS
     
-    async def get_available_models(self) -> List[str]:
-        """Get list of available models from Ollama"""
+    async def get_available_models(self, force_refresh: bool = False, require_live: bool = False) -> List[str]:
+        """Get list of available models from Ollama; require_live skips the fresh disk cache"""
+        timestamp, models, live = self._models_cache
+        if (not force_refresh and models is not None and (live or not require_live)
+                and time.monotonic() - timestamp < MODELS_CACHE_TTL):
+            return models
+        
+        async with self._models_lock:
+            # Another caller may have refreshed the list while we waited
+            timestamp, models, live = self._models_cache
+            if (not force_refresh and models is not None and (live or not require_live)
+                    and time.monotonic() - timestamp < MODELS_CACHE_TTL):
+                return models
+            
+            live = False
+            cached, fresh = await self._read_disk_cache("tags")
+            if cached is not None and (self._remote_disabled or (fresh and not force_refresh and not require_live)):
+                models = cached
+            elif self._remote_disabled:
+                return []
+            else:
+                models = await self._fetch_available_models()
+                if models is None:
+                    if cached is None:
+                        return []
+                    logger.warning("Using stale cached model list")
+                    models = cached
+                else:
+                    live = True
+                    await self._write_disk_cache("tags", models)
+            
+            self._models_cache = (time.monotonic(), models, live)
+            return models
+    
+    async def _fetch_available_models(self) -> Optional[List[str]]:
+        """Fetch the model list from Ollama, returning None on failure"""
         try:
             if not await self.check_ollama_status():
                 if not await self.start_ollama():
-                    return []
+                    return None
             
             client = await self.get_client()
-            response = await client.get(f"{self.ollama_host}/api/tags")
+            response = await client.get("/api/tags")
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 models = [model["name"] for model in data.get("models", [])]
                 return models
             else:
-                logger.error(f"Failed to get models: {response.status_code}")
-                return []
+                logger.error("Failed to get models: %s", response.status_code)
+                return None
                 
         except Exception as e:
-            logger.error(f"Error getting available models: {e}")
-            return []
+            logger.error("Error getting available models: %s", e)
+            return None
+    
+    def _model_info_cache_name(self, model_name: str) -> str:
+        """Disk cache entry name for a model's /api/show result"""
+        return "show-" + quote(model_name, safe="")
+    
+    async def _read_disk_cache(self, name: str) -> Tuple[Optional[Any], bool]:
+        """Read a disk cache entry, returning (value or None, whether it is fresh)"""
+        return await asyncio.to_thread(self._sync_read_disk_cache, name)
+    
+    def _sync_read_disk_cache(self, name: str) -> Tuple[Optional[Any], bool]:
+        """Read a disk cache entry; runs in a worker thread"""
+        try:
+            with open(self._cache_dir / f"{name}.json", 'rb') as f:
+                value = _json.loads(f.read())
+        except (OSError, _json.JSONDecodeError):
+            return None, False
+        
+        # The marker's mtime records the last successful sync
+        try:
+            age = time.time() - (self._cache_dir / f"{name}.last_sync").stat().st_mtime
+        except OSError:
+            return value, False
+        return value, age < DISK_CACHE_TTL
+    
+    async def _write_disk_cache(self, name: str, value: Any):
+        """Atomically replace a disk cache entry and mark it as just synced"""
+        await asyncio.to_thread(self._sync_write_disk_cache, name, value)
+    
+    def _sync_write_disk_cache(self, name: str, value: Any):
+        """Replace a disk cache entry; runs in a worker thread"""
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._cache_dir / f"{name}.json"
+            tmp_path = path.with_suffix(".json.tmp")
+            tmp_path.write_bytes(_json.dumps(value))
+            os.replace(tmp_path, path)
+            (self._cache_dir / f"{name}.last_sync").touch()
+        except OSError as e:
+            logger.warning("Could not write cache entry %s: %s", name, e)
+    
+    async def _invalidate_model_caches(self, model_name: str):
+        """Forget the model list and a model's info after it was pulled or deleted"""
+        self._models_cache = (0.0, None, False)
+        self._model_info_cache.pop(model_name, None)
+        await asyncio.to_thread(self._sync_remove_sync_markers, ("tags", self._model_info_cache_name(model_name)))
+    
+    def _sync_remove_sync_markers(self, names: Tuple[str, ...]):
+        """Mark disk cache entries as stale; runs in a worker thread"""
+        # Only the markers go, so the old data can still serve as a stale fallback
+        for name in names:
+            try:
+                (self._cache_dir / f"{name}.last_sync").unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("Could not invalidate cache entry %s: %s", name, e)
     
     async def pull_model(self, model_name: str) -> bool:
         """Pull/download a model from Ollama registry"""
@@ -104,111 +358,134 @@ class ModelManager:
             # Start the pull request
             async with client.stream(
                 "POST",
-                f"{self.ollama_host}/api/pull",
+                "/api/pull",
                 json={"name": model_name}
             ) as response:
                 if response.status_code == 200:
-                    async for line in response.aiter_lines():
-                        if line:
-                            try:
-                                data = json.loads(line)
-                                status = data.get("status", "")
-                                logger.info(f"Pulling {model_name}: {status}")
-                                
-                                # Check if pull is complete
-                                if "success" in status.lower() or data.get("status") == "success":
-                                    return True
-                            except json.JSONDecodeError:
-                                continue
+                    # Progress lines repeat the same status many times a second; log each
+                    # new status, and the same one again at most every PULL_LOG_INTERVAL
+                    last_status = ""
+                    last_log_time = 0.0
+                    async for line in _aiter_ndjson_lines(response):
+                        try:
+                            data = _json.loads(line)
+                        except _json.JSONDecodeError:
+                            continue
+                        
+                        if "error" in data:
+                            logger.error("Failed to pull model %s: %s", model_name, data["error"])
+                            return False
+                        
+                        status = data.get("status", "")
+                        now = time.monotonic()
+                        if logger.isEnabledFor(logging.INFO) and (status != last_status or now - last_log_time >= PULL_LOG_INTERVAL):
+                            total = data.get("total")
+                            if total:
+                                logger.info("Pulling %s: %s (%d%%)", model_name, status, data.get("completed", 0) * 100 // total)
+                            else:
+                                logger.info("Pulling %s: %s", model_name, status)
+                            last_status = status
+                            last_log_time = now
+                        
+                        # Check if pull is complete
+                        if status == "success" or data.get("done"):
+                            await self._invalidate_model_caches(model_name)
+                            return True
                 else:
-                    logger.error(f"Failed to pull model: {response.status_code}")
+                    logger.error("Failed to pull model: %s", response.status_code)
                     return False
             
-            return True
+            # The stream ended without a completion line, e.g. a dropped connection
+            logger.error("Pull of model %s ended before completing", model_name)
+            return False
             
         except Exception as e:
-            logger.error(f"Error pulling model {model_name}: {e}")
+            logger.error("Error pulling model %s: %s", model_name, e)
             return False
     
     async def switch_model(self, model_name: str) -> bool:
         """Switch to a different model"""
         try:
-            # Check if model is available
-            available_models = await self.get_available_models()
+            # Check if model is available; cached lists may still name a deleted model
+            available_models = await self.get_available_models(force_refresh=True)
             
             if model_name not in available_models:
-                logger.warning(f"Model {model_name} not available. Attempting to pull...")
+                logger.warning("Model %s not available. Attempting to pull...", model_name)
                 if not await self.pull_model(model_name):
                     return False
             
-            # Test the model with a simple query
-            test_response = await self.generate_response(
-                "Hello, respond with 'Model switched successfully'",
-                model_name
-            )
-            
-            if "successfully" in test_response.lower() or test_response:
+            # Confirm Ollama can load the model's metadata instead of running a test generation
+            if await self.get_model_info(model_name, use_cache=False) is not None:
                 self.current_model = model_name
-                logger.info(f"Successfully switched to model: {model_name}")
+                logger.info("Successfully switched to model: %s", model_name)
                 return True
             else:
-                logger.error(f"Model {model_name} test failed")
+                logger.error("Model %s could not be verified", model_name)
                 return False
                 
         except Exception as e:
-            logger.error(f"Error switching to model {model_name}: {e}")
+            logger.error("Error switching to model %s: %s", model_name, e)
             return False
     
     async def generate_response(
         self, 
         message: str, 
         model: Optional[str] = None,
-        conversation_history: Optional[List[Dict]] = None
-    ) -> str:
-        """Generate response using Ollama model"""
+        conversation_history: Optional[List[Dict]] = None,
+        strict: bool = False,
+        use_builtin_history: bool = False
+    ) -> Optional[str]:
+        """Generate response using Ollama model; failures return an "Error: ..." message, or None if strict"""
         try:
             if not await self.check_ollama_status():
                 if not await self.start_ollama():
-                    return "Error: Ollama service is not available"
+                    return None if strict else "Error: Ollama service is not available"
             
             model_to_use = model or self.current_model
             client = await self.get_client()
             
             # Prepare the prompt with conversation history
-            prompt = self._prepare_prompt(message, conversation_history)
+            prompt = self._prepare_prompt(message, conversation_history, use_builtin_history)
             
             # Generate response
             response = await client.post(
-                f"{self.ollama_host}/api/generate",
-                json={
+                "/api/generate",
+                content=_json.dumps({
                     "model": model_to_use,
                     "prompt": prompt,
                     "stream": False,
-                    "options": {
-                        "temperature": self.config.get_behavior_settings().get("temperature", 0.7),
-                        "top_p": 0.9,
-                        "top_k": 40,
-                        "num_predict": self.config.get_behavior_settings().get("max_tokens", 2000)
-                    }
-                }
+                    "options": self._gen_options
+                }),
+                headers=_JSON_HEADERS
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json.loads(response.content)
                 return data.get("response", "No response generated")
             else:
-                logger.error(f"Generation failed: {response.status_code}")
-                return f"Error: Failed to generate response (Status: {response.status_code})"
+                logger.error("Generation failed: %s", response.status_code)
+                return None if strict else f"Error: Failed to generate response (Status: {response.status_code})"
                 
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return f"Error: {str(e)}"
+            logger.error("Error generating response: %s", e)
+            return None if strict else f"Error: {str(e)}"
+    
+    async def generate_responses(self, messages: List[str], model: Optional[str] = None) -> List[str]:
+        """Generate responses for several messages concurrently, so Ollama can batch them on the loaded model"""
+        semaphore = asyncio.Semaphore(GENERATE_MAX_PARALLEL)
+        
+        async def generate_one(message: str) -> str:
+            async with semaphore:
+                return await self.generate_response(message, model)
+        
+        return await asyncio.gather(*(generate_one(message) for message in messages))
     
     async def generate_streaming_response(
         self, 
         message: str, 
         model: Optional[str] = None,
-        conversation_history: Optional[List[Dict]] = None
+        conversation_history: Optional[List[Dict]] = None,
+        use_builtin_history: bool = False
     ):
         """Generate streaming response using Ollama model"""
         try:
@@ -221,85 +498,116 @@ class ModelManager:
             client = await self.get_client()
             
             # Prepare the prompt with conversation history
-            prompt = self._prepare_prompt(message, conversation_history)
+            prompt = self._prepare_prompt(message, conversation_history, use_builtin_history)
             
             # Generate streaming response
             async with client.stream(
                 "POST",
-                f"{self.ollama_host}/api/generate",
-                json={
+                "/api/generate",
+                content=_json.dumps({
                     "model": model_to_use,
                     "prompt": prompt,
                     "stream": True,
-                    "options": {
-                        "temperature": self.config.get_behavior_settings().get("temperature", 0.7),
-                        "top_p": 0.9,
-                        "top_k": 40,
-                        "num_predict": self.config.get_behavior_settings().get("max_tokens", 2000)
-                    }
-                }
+                    "options": self._gen_options
+                }),
+                headers=_JSON_HEADERS
             ) as response:
                 if response.status_code == 200:
-                    async for line in response.aiter_lines():
-                        if line:
-                            try:
-                                data = json.loads(line)
-                                if "response" in data:
-                                    yield data["response"]
-                                    
-                                if data.get("done", False):
-                                    break
-                            except json.JSONDecodeError:
-                                continue
+                    async for line in _aiter_ndjson_lines(response):
+                        try:
+                            data = _json.loads(line)
+                            if "response" in data:
+                                yield data["response"]
+                                
+                            if data.get("done", False):
+                                break
+                        except _json.JSONDecodeError:
+                            continue
                 else:
                     yield f"Error: Failed to generate response (Status: {response.status_code})"
                     
         except Exception as e:
-            logger.error(f"Error generating streaming response: {e}")
+            logger.error("Error generating streaming response: %s", e)
             yield f"Error: {str(e)}"
     
-    def _prepare_prompt(self, message: str, conversation_history: Optional[List[Dict]] = None) -> str:
+    def append_turn(self, role: str, content: str):
+        """Record a turn in the built-in history used by calls made with use_builtin_history=True"""
+        self._history.append((role, content))
+    
+    def clear_turns(self):
+        """Forget the built-in history"""
+        self._history.clear()
+    
+    def _prepare_prompt(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict]] = None,
+        use_builtin_history: bool = False
+    ) -> str:
         """Prepare prompt with system context and conversation history"""
-        system_prompt = self.config.get_system_prompt()
-        
-        # Build conversation context
-        context = f"System: {system_prompt}\n\n"
-        
-        if conversation_history:
-            # Include last 10 messages for context
-            recent_history = conversation_history[-10:]
-            for msg in recent_history:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                if role == "user":
-                    context += f"User: {content}\n"
-                elif role == "assistant":
-                    context += f"Assistant: {content}\n"
-        
-        context += f"User: {message}\nAssistant: "
-        
-        return context
+        turns = self._history if use_builtin_history else ()
+        return build_prompt(self._system_prefix, message, conversation_history, turns)
     
-    async def get_model_info(self, model_name: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information about a model"""
+    async def get_model_info(self, model_name: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get detailed information about a model; use_cache=False always asks Ollama"""
+        cache_name = self._model_info_cache_name(model_name)
+        cached = None
+        # With remote models disabled the caches are the only source
+        if use_cache or self._remote_disabled:
+            info = self._model_info_cache.get(model_name)
+            if info is not None:
+                return info
+            
+            cached, fresh = await self._read_disk_cache(cache_name)
+            if cached is not None and (fresh or self._remote_disabled):
+                self._model_info_cache[model_name] = cached
+                return cached
+            if self._remote_disabled:
+                return None
+        
         try:
             if not await self.check_ollama_status():
-                return None
+                return cached
             
             client = await self.get_client()
             response = await client.post(
-                f"{self.ollama_host}/api/show",
+                "/api/show",
                 json={"name": model_name}
             )
             
             if response.status_code == 200:
-                return response.json()
+                info = _json.loads(response.content)
+                self._model_info_cache[model_name] = info
+                await self._write_disk_cache(cache_name, info)
+                return info
             else:
-                return None
+                return cached
                 
         except Exception as e:
-            logger.error(f"Error getting model info for {model_name}: {e}")
+            logger.error("Error getting model info for %s: %s", model_name, e)
+            return cached
+    
+    async def get_model_capabilities(self, model_name: str) -> Optional[List[str]]:
+        """Get the capabilities Ollama reports for a model, or None if unknown"""
+        # Served from the model info caches after the first /api/show
+        info = await self.get_model_info(model_name)
+        if info is None:
             return None
+        return info.get("capabilities")
+    
+    async def get_models_info(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get information about several models, querying a few at a time"""
+        semaphore = asyncio.Semaphore(MODEL_INFO_CONCURRENCY)
+        
+        async def fetch_one(name: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.get_model_info(name)
+        
+        infos = await asyncio.gather(*(fetch_one(name) for name in names), return_exceptions=True)
+        return {
+            name: info for name, info in zip(names, infos)
+            if info is not None and not isinstance(info, Exception)
+        }
     
     async def delete_model(self, model_name: str) -> bool:
         """Delete a model from local storage"""
@@ -309,36 +617,35 @@ class ModelManager:
             
             client = await self.get_client()
             response = await client.delete(
-                f"{self.ollama_host}/api/delete",
+                "/api/delete",
                 json={"name": model_name}
             )
             
-            return response.status_code == 200
+            if response.status_code == 200:
+                await self._invalidate_model_caches(model_name)
+                return True
+            return False
             
         except Exception as e:
-            logger.error(f"Error deleting model {model_name}: {e}")
+            logger.error("Error deleting model %s: %s", model_name, e)
             return False
     
     async def get_system_resources(self) -> Dict[str, Any]:
         """Get system resource usage"""
         try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = self._cpu_percent()
             
-            # Memory usage
-            memory = psutil.virtual_memory()
-            
-            # Disk usage
-            disk = psutil.disk_usage('/')
-            
-            # GPU usage (if available)
-            gpu_info = await self._get_gpu_info()
+            # The other psutil readings are synchronous, so sample them in a thread while the GPU query runs
+            (cpu_freq, memory, disk), gpu_info = await asyncio.gather(
+                asyncio.to_thread(self._sample_resources),
+                self._get_gpu_info()
+            )
             
             return {
                 "cpu": {
                     "percent": cpu_percent,
-                    "count": psutil.cpu_count(),
-                    "freq": psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None
+                    "count": self._cpu_count,
+                    "freq": cpu_freq._asdict() if cpu_freq else None
                 },
                 "memory": {
                     "total_gb": round(memory.total / (1024**3), 2),
@@ -356,57 +663,100 @@ class ModelManager:
             }
             
         except Exception as e:
-            logger.error(f"Error getting system resources: {e}")
+            logger.error("Error getting system resources: %s", e)
             return {}
     
+    def _cpu_percent(self) -> float:
+        """CPU usage since the previous reading, from a single cheap cpu_times() read"""
+        busy, total = _cpu_busy_and_total(psutil.cpu_times())
+        last_busy, last_total = self._cpu_times
+        self._cpu_times = (busy, total)
+        if total <= last_total:
+            return 0.0
+        return round(min(max((busy - last_busy) / (total - last_total) * 100, 0.0), 100.0), 1)
+    
+    def _sample_resources(self):
+        """Take CPU frequency, memory and disk readings; runs in a worker thread"""
+        return (
+            psutil.cpu_freq(),
+            psutil.virtual_memory(),
+            psutil.disk_usage('/')
+        )
+    
     async def _get_gpu_info(self) -> Optional[Dict[str, Any]]:
         """Get GPU information if available"""
+        # No nvidia-smi on this machine; don't try to launch it again
+        if self._nvidia_smi_available is False:
+            return None
+        
+        expires_at, gpu_info = self._gpu_cache
+        if time.monotonic() < expires_at:
+            return gpu_info
+        
+        gpu_info = await self._query_nvidia_smi()
+        self._gpu_cache = (time.monotonic() + GPU_INFO_CACHE_TTL, gpu_info)
+        return gpu_info
+    
+    async def _query_nvidia_smi(self) -> Optional[Dict[str, Any]]:
+        """Run nvidia-smi without blocking the event loop and parse its CSV output"""
         try:
-            # Try to get NVIDIA GPU info
-            result = subprocess.run(
-                ["nvidia-smi", "--query-gpu=name,memory.total,memory.used,utilization.gpu", 
-                 "--format=csv,noheader,nounits"],
-                capture_output=True,
-                text=True,
-                timeout=5
+            process = await asyncio.create_subprocess_exec(
+                "nvidia-smi", "--query-gpu=name,memory.total,memory.used,utilization.gpu",
+                "--format=csv,noheader,nounits",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
             )
-            
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                gpus = []
-                for line in lines:
-                    if line.strip():
-                        parts = line.split(', ')
-                        if len(parts) >= 4:
-                            gpus.append({
-                                "name": parts[0],
-                                "memory_total_mb": int(parts[1]),
-                                "memory_used_mb": int(parts[2]),
-                                "utilization_percent": int(parts[3])
-                            })
-                return {"nvidia_gpus": gpus} if gpus else None
-                
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, FileNotFoundError):
-            pass
+        except FileNotFoundError:
+            self._nvidia_smi_available = False
+            return None
+        self._nvidia_smi_available = True
+        
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None
+        
+        if process.returncode != 0:
+            return None
         
-        return None
+        gpus = []
+        for line in stdout.splitlines():
+            if line.strip():
+                parts = line.split(b", ")
+                if len(parts) >= 4:
+                    gpus.append({
+                        "name": parts[0].decode(),
+                        "memory_total_mb": int(parts[1]),
+                        "memory_used_mb": int(parts[2]),
+                        "utilization_percent": int(parts[3])
+                    })
+        return {"nvidia_gpus": gpus} if gpus else None
     
     async def optimize_model_selection(self, task_type: str, message: str) -> str:
         """Automatically select the best model for a given task"""
         try:
             # Get recommended models for the task
             recommended_models = self.config.get_model_for_task(task_type)
-            available_models = await self.get_available_models()
-            
-            # Find the first available recommended model
-            for model in recommended_models:
-                if model in available_models:
-                    return model
+            # A day-old disk list may still name models deleted since
+            available_models = await self.get_available_models(require_live=True)
+            
+            # Find the first available recommended model that can generate text,
+            # checking the candidates' capabilities concurrently
+            candidates = [model for model in recommended_models if model in available_models]
+            if candidates:
+                models_info = await self.get_models_info(candidates)
+                for model in candidates:
+                    # Older Ollama versions don't report capabilities; trust the name match then
+                    capabilities = models_info.get(model, {}).get("capabilities")
+                    if capabilities is None or "completion" in capabilities:
+                        return model
             
             # If no recommended model is available, try to pull the first one
             if recommended_models:
                 first_choice = recommended_models[0]
-                logger.info(f"Attempting to pull recommended model: {first_choice}")
+                logger.info("Attempting to pull recommended model: %s", first_choice)
                 if await self.pull_model(first_choice):
                     return first_choice
             
@@ -414,11 +764,50 @@ class ModelManager:
             return self.current_model
             
         except Exception as e:
-            logger.error(f"Error optimizing model selection: {e}")
+            logger.error("Error optimizing model selection: %s", e)
             return self.current_model
     
     async def cleanup(self):
         """Cleanup resources"""
         if self._client:
             await self._client.aclose()
-            self._client = None
\ No newline at end of file
+            self._client = None
+
+class BatchWindow:
+    """Collects single generate calls made within a short window and sends them as one generate_responses batch"""
+    
+    def __init__(self, model_manager: ModelManager, window: float = 0.005):
+        self.model_manager = model_manager
+        self.window = window
+        # model -> [(message, future)] waiting for the next flush
+        self._pending: Dict[Optional[str], List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def submit(self, message: str, model: Optional[str] = None) -> str:
+        """Queue a message for the current window and wait for its response"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(model, []).append((message, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+    
+    async def _flush_after_window(self):
+        """Wait out the window, then dispatch everything queued during it, one batch per model"""
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        await asyncio.gather(*(self._dispatch(model, batch) for model, batch in pending.items()))
+    
+    async def _dispatch(self, model: Optional[str], batch: List[Tuple[str, asyncio.Future]]):
+        """Run one model's batch and resolve its waiting futures"""
+        try:
+            responses = await self.model_manager.generate_responses([message for message, _ in batch], model)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
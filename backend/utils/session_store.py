@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List
+
+import aiofiles
+import aiofiles.os
+
+from utils import _json
+
+logger = logging.getLogger(__name__)
+
+# Session ids come from clients, so only plain file-name-safe ids are persisted
+_SESSION_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+# Bytes read per step when scanning a session file backwards for its last messages
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+def _read_last_lines(path: Path, count: int) -> List[bytes]:
+    """Read the last count lines of a file, scanning back from the end"""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # One newline more than needed guarantees the first kept line is complete
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(_TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data.splitlines()[-count:]
+
+def _compact_file(path: Path, count: int):
+    """Rewrite a file to hold only its last count lines"""
+    try:
+        lines = _read_last_lines(path, count)
+    except FileNotFoundError:
+        return
+    tmp_path = path.with_suffix(".ndjson.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(b"".join(line + b"\n" for line in lines))
+    os.replace(tmp_path, path)
+
+class SessionStore:
+    """Persists chat sessions as NDJSON files, one message per line, compacted to the latest max_messages"""
+
+    def __init__(self, directory: str = "sessions", max_open_files: int = 256, max_messages: int = 50):
+        self.directory = Path(directory)
+        self.max_open_files = max_open_files
+        self.max_messages = max_messages
+        # session_id -> open append handle, least recently used first
+        self._files: "OrderedDict[str, Any]" = OrderedDict()
+        # session_id -> messages appended through the open handle
+        self._appended: Dict[str, int] = {}
+        # Serializes all file operations, so no handle is closed while a write is using it
+        self._lock = asyncio.Lock()
+
+    def _session_path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.ndjson"
+
+    async def append(self, session_id: str, message: Dict[str, Any]):
+        """Append a single message to the session's file"""
+        if not _SESSION_ID_RE.fullmatch(session_id):
+            logger.warning("Not persisting session with unsafe id: %r", session_id)
+            return
+
+        try:
+            async with self._lock:
+                f = self._files.get(session_id)
+                if f is None:
+                    f = await self._open(session_id)
+                else:
+                    self._files.move_to_end(session_id)
+
+                await f.write(_json.dumps(message) + b"\n")
+                await f.flush()
+
+                # Closing the handle makes the next append compact the file on reopening
+                self._appended[session_id] += 1
+                if self._appended[session_id] >= self.max_messages:
+                    await self._close_handle(session_id)
+        except Exception as e:
+            logger.error("Error persisting session %s: %s", session_id, e)
+
+    async def _open(self, session_id: str):
+        """Compact a session's file and open its append handle; called with the lock held"""
+        path = self._session_path(session_id)
+        await aiofiles.os.makedirs(self.directory, exist_ok=True)
+        await asyncio.to_thread(_compact_file, path, self.max_messages)
+        f = await aiofiles.open(path, 'ab')
+        self._files[session_id] = f
+        self._appended[session_id] = 0
+
+        # Keep the number of open handles bounded
+        if len(self._files) > self.max_open_files:
+            await self._close_handle(next(iter(self._files)))
+        return f
+
+    async def _close_handle(self, session_id: str):
+        """Close a session's append handle if it is open; called with the lock held"""
+        f = self._files.pop(session_id, None)
+        self._appended.pop(session_id, None)
+        if f is not None:
+            await f.close()
+
+    async def load(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Read a session's last limit messages back, or [] if it was never persisted"""
+        if not _SESSION_ID_RE.fullmatch(session_id):
+            return []
+
+        try:
+            lines = await asyncio.to_thread(_read_last_lines, self._session_path(session_id), limit)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error("Error loading session %s: %s", session_id, e)
+            return []
+
+        messages = []
+        for line in lines:
+            try:
+                messages.append(_json.loads(line))
+            except _json.JSONDecodeError:
+                # A partial line left by an interrupted write
+                continue
+        return messages
+
+    async def delete(self, session_id: str):
+        """Close and remove a session's file"""
+        if not _SESSION_ID_RE.fullmatch(session_id):
+            return
+
+        async with self._lock:
+            await self._close_handle(session_id)
+            try:
+                await aiofiles.os.remove(self._session_path(session_id))
+            except FileNotFoundError:
+                pass
+
+    async def close(self):
+        """Close all open session files"""
+        async with self._lock:
+            while self._files:
+                await self._close_handle(next(iter(self._files)))